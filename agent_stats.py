@@ -0,0 +1,81 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Timing spans and counters for the agent's own overhead, shared by all threads
+_lock = threading.Lock()
+_spans = {}
+_counters = {}
+
+PROMETHEUS_PREFIX = "spectre_agent"
+
+@contextmanager
+def span(name):
+    """Time the enclosed block and add it to the span called name"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _lock:
+            stats = _spans.get(name)
+            if stats is None:
+                stats = _spans[name] = {"count": 0, "total_seconds": 0.0, "max_seconds": 0.0, "last_seconds": 0.0}
+            stats["count"] += 1
+            stats["total_seconds"] += elapsed
+            stats["last_seconds"] = elapsed
+            stats["max_seconds"] = max(stats["max_seconds"], elapsed)
+
+def increment(name, amount=1):
+    """Add amount to the counter called name"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+def snapshot():
+    """Return a copy of all spans and counters, suitable for the _agent_stats report section"""
+    with _lock:
+        return {
+            "spans": {name: dict(stats) for name, stats in _spans.items()},
+            "counters": dict(_counters)
+        }
+
+def reset():
+    """Clear all spans and counters"""
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+
+def format_prometheus():
+    """Render spans and counters in the Prometheus text exposition format"""
+    stats = snapshot()
+    lines = []
+
+    metrics = [
+        ("span_seconds_total", "counter", "Total time spent in each agent span", "total_seconds"),
+        ("span_calls_total", "counter", "Number of times each agent span ran", "count"),
+        ("span_last_seconds", "gauge", "Duration of the most recent run of each agent span", "last_seconds"),
+        ("span_max_seconds", "gauge", "Longest run of each agent span", "max_seconds")
+    ]
+    for metric, metric_type, help_text, field in metrics:
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_{metric} {help_text}")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{metric} {metric_type}")
+        for name, values in sorted(stats["spans"].items()):
+            lines.append(f'{PROMETHEUS_PREFIX}_{metric}{{span="{name}"}} {values[field]}')
+
+    lines.append(f"# HELP {PROMETHEUS_PREFIX}_events_total Agent event counters (retries, payload bytes, ...)")
+    lines.append(f"# TYPE {PROMETHEUS_PREFIX}_events_total counter")
+    for name, value in sorted(stats["counters"].items()):
+        lines.append(f'{PROMETHEUS_PREFIX}_events_total{{counter="{name}"}} {value}')
+
+    return "\n".join(lines) + "\n"
+
+def write_prometheus_textfile(path):
+    """Write the metrics for node_exporter's textfile collector, atomically so it never reads a partial file"""
+    try:
+        tmp_file = path + ".tmp"
+        with open(tmp_file, "w") as f:
+            f.write(format_prometheus())
+        os.replace(tmp_file, path)
+    except OSError as e:
+        print(f"Error writing Prometheus textfile: {e}")
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from schema import SUPABASE_URL, SUPABASE_KEY
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2]);
+# without it the pool still keeps HTTP/1.1 connections alive
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Upload pool configuration
+MAX_CONNECTIONS = 10
+MAX_CONCURRENCY = 20
+KEEPALIVE_EXPIRY = 120
+REQUEST_TIMEOUT = 30
+
+class AsyncUploader:
+    """Uploads reports to Supabase over one shared keep-alive connection pool"""
+
+    def __init__(self, url=SUPABASE_URL, key=SUPABASE_KEY, max_connections=MAX_CONNECTIONS,
+                 concurrency=MAX_CONCURRENCY):
+        self.concurrency = concurrency
+        self._semaphore = None
+        self.stats = {
+            "requests": 0,
+            "errors": 0,
+            "connections_opened": 0,
+            "bytes_sent": 0,
+            "request_seconds": 0.0
+        }
+
+        self.client = httpx.AsyncClient(
+            base_url=f"{url}/rest/v1",
+            headers={
+                "apikey": key,
+                "Authorization": f"Bearer {key}",
+                "Content-Type": "application/json"
+            },
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections,
+                keepalive_expiry=KEEPALIVE_EXPIRY
+            ),
+            timeout=REQUEST_TIMEOUT
+        )
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def _trace(self, event_name, info):
+        """httpcore trace hook, used to count new TCP connections"""
+        if event_name == "connection.connect_tcp.complete":
+            self.stats["connections_opened"] += 1
+
+    async def post(self, path, rows, prefer, params=None):
+        """POST rows to a PostgREST path, returning the response or None on failure"""
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+
+        body = json.dumps(rows, separators=(",", ":")).encode()
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self.client.post(
+                    path,
+                    content=body,
+                    params=params,
+                    headers={"Prefer": prefer},
+                    extensions={"trace": self._trace}
+                )
+                response.raise_for_status()
+                return response
+            except Exception as e:
+                self.stats["errors"] += 1
+                print(f"Error uploading data to Supabase: {e}")
+                return None
+            finally:
+                self.stats["requests"] += 1
+                self.stats["bytes_sent"] += len(body)
+                self.stats["request_seconds"] += time.perf_counter() - started
+
+    async def upload(self, system_info):
+        """Upsert one report into device_specs, like upload_to_supabase()"""
+        return await self.post(
+            "/device_specs",
+            system_info,
+            "resolution=merge-duplicates,return=minimal",
+            params={"on_conflict": "device_id"}
+        )
+
+    async def upload_many(self, reports):
+        """Upload several reports concurrently, at most `concurrency` in flight at once"""
+        return await asyncio.gather(*(self.upload(report) for report in reports))
+
+    def pool_stats(self):
+        """Return request counters and how well connections are being reused"""
+        stats = dict(self.stats)
+        stats["http2"] = HTTP2_AVAILABLE
+        stats["avg_request_seconds"] = stats["request_seconds"] / stats["requests"] if stats["requests"] else 0.0
+        stats["requests_per_connection"] = stats["requests"] / stats["connections_opened"] if stats["connections_opened"] else 0.0
+        return stats
+
+    async def aclose(self):
+        await self.client.aclose()
+
+async def upload_reports(reports, concurrency=MAX_CONCURRENCY):
+    """Upload reports concurrently over a fresh pool and return (results, pool_stats)"""
+    async with AsyncUploader(concurrency=concurrency) as uploader:
+        results = await uploader.upload_many(reports)
+        return results, uploader.pool_stats()
+
+if __name__ == "__main__":
+    import sys
+
+    # Upload one or more saved system_info.json files
+    paths = sys.argv[1:] or ["system_info.json"]
+    reports = []
+    for path in paths:
+        with open(path) as f:
+            reports.append(json.load(f))
+
+    results, stats = asyncio.run(upload_reports(reports))
+    print(f"Uploaded {sum(1 for result in results if result is not None)}/{len(results)} reports")
+    print(json.dumps(stats, indent=4))
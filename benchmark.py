@@ -0,0 +1,302 @@
+import argparse
+import asyncio
+import http.server
+import json
+import os
+import platform
+import psutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import gpu
+import main
+from async_upload import AsyncUploader
+from procfs import open_procfs_reader
+from processes import ProcessSampler
+from sampler import HighFrequencySampler
+from supabase import create_client
+
+# Benchmark configuration
+WARM_RUNS = 20
+UPLOAD_REPORTS = 200
+UPLOAD_CONCURRENCY = 20
+SYNTHETIC_PROCESSES = 1000
+SAMPLE_RUNS = 2000
+RESULTS_FILE = "benchmark_results.json"
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    """Answers every PostgREST request with an empty 201, standing in for Supabase"""
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment so delayed ACKs don't skew latency
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"[]")
+
+    do_PATCH = do_POST
+
+    def log_message(self, format, *args):
+        pass
+
+def start_stub_server():
+    """Start a local HTTP stub in a background thread and return its URL"""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(samples):
+    """Summarize a list of durations in seconds"""
+    return {
+        "runs": len(samples),
+        "min": min(samples),
+        "mean": statistics.mean(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "max": max(samples)
+    }
+
+def time_call(function):
+    """Return how long one call of function takes"""
+    started = time.perf_counter()
+    function()
+    return time.perf_counter() - started
+
+def reset_device_cache(cache_dir):
+    """Forget everything the agent keeps between calls, so the next call runs as on a fresh start
+
+    That is the in-memory and on-disk device cache (so cpuinfo is probed
+    again), the GPU backend and the no-GPU cache, and the collector state:
+    open /proc and cgroup files, the parsed mount table and the statvfs pool.
+    """
+    main._device_cache = None
+    main.DEVICE_CACHE_FILE = os.path.join(cache_dir, "device_cache.json")
+    gpu.GPU_CACHE_FILE = os.path.join(cache_dir, "gpu_cache.json")
+    for path in (main.DEVICE_CACHE_FILE, gpu.GPU_CACHE_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+
+    with main._gpu_backend_lock:
+        if main._gpu_backend is not None:
+            main._gpu_backend.close()
+            main._gpu_backend = None
+    with main._collector_state_lock:
+        for state in main._collector_state.values():
+            if hasattr(state, "close"):
+                state.close()
+        main._collector_state.clear()
+
+def bench_cold_warm(function, cache_dir, warm_runs):
+    """Time the first call after a cache reset, then warm_runs more calls"""
+    reset_device_cache(cache_dir)
+    cold = time_call(function)
+    warm = [time_call(function) for _ in range(warm_runs)]
+    return {"cold_seconds": cold, "warm": summarize(warm)}
+
+def bench_collectors(cache_dir, warm_runs):
+    """Time each collector, device ID generation and the full report"""
+    results = {}
+    for name, collector, _ in main.COLLECTORS:
+        print(f"Benchmarking {name} collector...")
+        results[f"collector.{name}"] = bench_cold_warm(lambda: collector({}), cache_dir, warm_runs)
+
+    print("Benchmarking generate_device_id...")
+    results["generate_device_id"] = bench_cold_warm(main.generate_device_id, cache_dir, warm_runs)
+
+    print("Benchmarking get_system_info...")
+    results["get_system_info"] = bench_cold_warm(main.get_system_info, cache_dir, warm_runs)
+
+    print("Benchmarking sample_dynamic_info...")
+    system_info = main.get_system_info()
+    results["sample_dynamic_info"] = {
+        "warm": summarize([time_call(lambda: main.sample_dynamic_info(system_info)) for _ in range(warm_runs)])
+    }
+    return results
+
+def bench_sampling(sample_runs):
+    """Time each high-frequency metric read through psutil and through the procfs fast path"""
+    reader = open_procfs_reader()
+    if reader is None:
+        print("Skipping the procfs sampling benchmark: needs Linux")
+        return {}
+
+    print(f"Benchmarking metric sampling, psutil against procfs, {sample_runs} samples each...")
+    reads = {
+        "memory": (psutil.virtual_memory, reader.memory),
+        "cpu_percent": (lambda: (psutil.cpu_percent(None), psutil.cpu_percent(None, percpu=True)), reader.cpu_percent),
+        "cpu_frequency": (psutil.cpu_freq, reader.cpu_frequency),
+        "disk_io": (psutil.disk_io_counters, reader.disk_io),
+        "net_io": (psutil.net_io_counters, reader.net_io),
+        "all": (HighFrequencySampler(sample_runs, use_procfs=False).sample, HighFrequencySampler(sample_runs).sample)
+    }
+    results = {}
+    for name, (psutil_read, procfs_read) in reads.items():
+        for path, function in (("psutil", psutil_read), ("procfs", procfs_read)):
+            results[f"sample.{name}.{path}"] = {"warm": summarize([time_call(function) for _ in range(sample_runs)])}
+        speedup = results[f"sample.{name}.psutil"]["warm"]["p50"] / results[f"sample.{name}.procfs"]["warm"]["p50"]
+        results[f"sample.{name}.procfs"]["speedup_p50"] = speedup
+    reader.close()
+    return results
+
+def spawn_idle_processes(count):
+    """Start count idle child processes, forked where possible so they're cheap"""
+    children = []
+    for _ in range(count):
+        if hasattr(os, "fork"):
+            pid = os.fork()
+            if pid == 0:
+                time.sleep(600)
+                os._exit(0)
+            children.append(pid)
+        else:
+            children.append(subprocess.Popen([sys.executable, "-c", "import time; time.sleep(600)"]))
+    return children
+
+def stop_processes(children):
+    """Kill and reap the children started by spawn_idle_processes"""
+    for child in children:
+        if isinstance(child, int):
+            os.kill(child, 9)
+            os.waitpid(child, 0)
+        else:
+            child.kill()
+            child.wait()
+
+def naive_top_processes(top_n):
+    """The straightforward way: every attribute is a separate read per process"""
+    processes = []
+    for process in psutil.process_iter():
+        try:
+            times = process.cpu_times()
+            processes.append((times.user + times.system, process.memory_info().rss, process.pid, process.name()))
+        except psutil.Error:
+            pass
+    return sorted(processes, reverse=True)[:top_n]
+
+def bench_processes(count, warm_runs):
+    """Time the process collector against the naive scan with count extra idle processes"""
+    print(f"Benchmarking process collector with {count} synthetic processes...")
+    children = spawn_idle_processes(count)
+    try:
+        sampler = ProcessSampler()
+        psutil_sampler = ProcessSampler(use_procfs=False)
+        return {
+            "process_count": len(psutil.pids()),
+            "processes.naive": {"warm": summarize([time_call(lambda: naive_top_processes(sampler.top_n)) for _ in range(warm_runs)])},
+            "processes.sampler_psutil": {
+                "cold_seconds": time_call(psutil_sampler.sample),
+                "warm": summarize([time_call(psutil_sampler.sample) for _ in range(warm_runs)])
+            },
+            "processes.sampler": {
+                "cold_seconds": time_call(sampler.sample),
+                "warm": summarize([time_call(sampler.sample) for _ in range(warm_runs)])
+            }
+        }
+    finally:
+        stop_processes(children)
+
+def bench_upload(url, key, reports):
+    """Time upload_to_supabase() one report at a time, then the async uploader concurrently"""
+    results = {}
+
+    print(f"Benchmarking upload_to_supabase against {url}...")
+    main.supabase = create_client(url, key)
+    latencies = []
+    started = time.perf_counter()
+    for report in reports:
+        latencies.append(time_call(lambda: main.upload_to_supabase(report)))
+    elapsed = time.perf_counter() - started
+    results["upload_to_supabase"] = {
+        "latency": summarize(latencies),
+        "reports_per_second": len(reports) / elapsed
+    }
+
+    print(f"Benchmarking AsyncUploader with concurrency {UPLOAD_CONCURRENCY}...")
+    async def run():
+        async with AsyncUploader(url, key, concurrency=UPLOAD_CONCURRENCY) as uploader:
+            started = time.perf_counter()
+            await uploader.upload_many(reports)
+            return time.perf_counter() - started, uploader.pool_stats()
+    elapsed, pool_stats = asyncio.run(run())
+    results["async_upload"] = {
+        "reports_per_second": len(reports) / elapsed,
+        "pool": pool_stats
+    }
+    return results
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Benchmark the collectors and the upload path")
+    parser.add_argument("--warm-runs", type=int, default=WARM_RUNS, help=f"warm calls per collector (default: {WARM_RUNS})")
+    parser.add_argument("--upload-reports", type=int, default=UPLOAD_REPORTS, help=f"reports to upload (default: {UPLOAD_REPORTS})")
+    parser.add_argument("--url", help="local PostgREST/Supabase URL to upload to (default: a built-in HTTP stub)")
+    parser.add_argument("--key", default=main.SUPABASE_KEY, help="API key for --url")
+    parser.add_argument("--processes", type=int, default=SYNTHETIC_PROCESSES, help=f"idle processes to start for the process collector benchmark (default: {SYNTHETIC_PROCESSES})")
+    parser.add_argument("--sample-runs", type=int, default=SAMPLE_RUNS, help=f"samples per metric for the psutil/procfs sampling benchmark (default: {SAMPLE_RUNS})")
+    parser.add_argument("--skip-upload", action="store_true", help="only benchmark the collectors")
+    parser.add_argument("--output", default=RESULTS_FILE, help=f"where to write the JSON results (default: {RESULTS_FILE})")
+    return parser.parse_args(argv)
+
+def main_benchmark():
+    """Run the benchmarks and write machine-readable results"""
+    args = parse_args()
+    # Keep the uploads' status lines out of the timings summary
+    quiet = open(os.devnull, "w")
+
+    results = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "timestamp": int(time.time()),
+        "benchmarks": {}
+    }
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        results["benchmarks"].update(bench_collectors(cache_dir, args.warm_runs))
+        report = main.get_system_info()
+
+    results["benchmarks"].update(bench_sampling(args.sample_runs))
+
+    processes = bench_processes(args.processes, args.warm_runs)
+    results["process_count"] = processes.pop("process_count")
+    results["benchmarks"].update(processes)
+
+    if not args.skip_upload:
+        url = args.url or start_stub_server()
+        reports = [dict(report, timestamp=report["timestamp"] + i) for i in range(args.upload_reports)]
+        stdout, sys.stdout = sys.stdout, quiet
+        try:
+            results["benchmarks"].update(bench_upload(url, args.key, reports))
+        finally:
+            sys.stdout = stdout
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+
+    for name, result in results["benchmarks"].items():
+        if "warm" in result:
+            cold = f"cold {result['cold_seconds'] * 1000:9.2f} ms  " if "cold_seconds" in result else " " * 22
+            speedup = f"  {result['speedup_p50']:5.1f}x faster than psutil" if "speedup_p50" in result else ""
+            print(f"{name:28} {cold}warm p50 {result['warm']['p50'] * 1000:9.3f} ms{speedup}")
+        else:
+            print(f"{name:28} {result['reports_per_second']:9.1f} reports/s")
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,358 @@
+"""Streaming export of device_specs and the history tables.
+
+Walks a table with keyset pagination, fetching page_size rows at a time with
+WHERE (key) > (last key seen) ORDER BY key LIMIT page_size, so every page is
+an index range scan however deep into the table it is, unlike OFFSET. Rows go
+straight to a JSON Lines, CSV or Parquet file, so memory stays flat.
+
+With --workers N the first key column's range is split into N slices, each
+exported by its own connection into its own part file (out.part-0.jsonl, ...).
+
+Needs asyncpg (pip install asyncpg), and pyarrow for Parquet:
+
+    python bulk_export.py device_specs --format csv --columns device_id,node_name,memory_total
+    python bulk_export.py device_metrics --workers 4 --output metrics.jsonl
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from schema import DEFAULT_DSN
+
+# Exporter configuration
+PAGE_SIZE = 10000
+
+# Key each table is paged by; every key is backed by an index
+TABLE_KEYS = {
+    "device_specs": ("id",),
+    "device_metrics": ("device_id", "ts"),
+    "device_cgroup_metrics": ("device_id", "cgroup", "ts"),
+    "device_metrics_1m": ("device_id", "bucket"),
+    "device_metrics_1h": ("device_id", "bucket"),
+    "device_metrics_1d": ("device_id", "bucket")
+}
+# Other orders a table can be paged in, chosen with --key
+ALTERNATE_KEYS = {
+    "device_specs": [("created_at", "id")]
+}
+# Key columns that may be NULL. A NULL never compares greater than the last
+# key seen, so rows where it is NULL are walked separately, first, by the
+# rest of the key
+NULLABLE_KEY_COLUMNS = {
+    "device_specs": {"created_at"}
+}
+
+FORMAT_EXTENSIONS = {"jsonl": ".jsonl", "csv": ".csv", "parquet": ".parquet"}
+
+# Postgres types that map to something better than a string in Parquet
+PARQUET_TYPES = {
+    "smallint": "int16",
+    "integer": "int32",
+    "bigint": "int64",
+    "real": "float32",
+    "double precision": "float64",
+    "numeric": "float64",
+    "boolean": "bool_"
+}
+
+def to_plain(value):
+    """Turn a value asyncpg returns into something JSON can hold"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+class JsonlWriter:
+    """Writes one JSON object per line"""
+
+    def __init__(self, path, columns, column_types):
+        self.f = open(path, "w", encoding="utf-8")
+
+    def write_rows(self, rows):
+        self.f.writelines(
+            json.dumps({name: to_plain(value) for name, value in row.items()}, separators=(",", ":")) + "\n"
+            for row in rows
+        )
+
+    def close(self):
+        self.f.close()
+
+class CsvWriter:
+    """Writes a header row, then one line per row with JSON columns as JSON text"""
+
+    def __init__(self, path, columns, column_types):
+        self.f = open(path, "w", encoding="utf-8", newline="")
+        self.writer = csv.writer(self.f)
+        self.writer.writerow(columns)
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.writer.writerow([
+                json.dumps(value) if isinstance(value, (dict, list)) else to_plain(value)
+                for value in row.values()
+            ])
+
+    def close(self):
+        self.f.close()
+
+class ParquetWriter:
+    """Writes each page as a Parquet row group"""
+
+    def __init__(self, path, columns, column_types):
+        fields = []
+        for name in columns:
+            pg_type = column_types[name]
+            if pg_type == "timestamp with time zone":
+                arrow_type = pyarrow.timestamp("us", tz="UTC")
+            else:
+                arrow_type = getattr(pyarrow, PARQUET_TYPES.get(pg_type, "string"))()
+            fields.append(pyarrow.field(name, arrow_type))
+        self.schema = pyarrow.schema(fields)
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema)
+
+    def write_rows(self, rows):
+        arrays = {}
+        for field in self.schema:
+            values = [row[field.name] for row in rows]
+            if pyarrow.types.is_string(field.type):
+                values = [
+                    None if value is None
+                    else json.dumps(value) if isinstance(value, (dict, list))
+                    else str(to_plain(value))
+                    for value in values
+                ]
+            elif isinstance(next((value for value in values if value is not None), None), Decimal):
+                values = [to_plain(value) for value in values]
+            arrays[field.name] = values
+        self.writer.write_table(pyarrow.table(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter, "parquet": ParquetWriter}
+
+def build_page_sql(table, columns, key, first_page, lower, upper, upper_inclusive, conditions=()):
+    """Build the query for one page of a keyset walk over table
+
+    Parameters are numbered in this order: the last key seen (one per key
+    column, left out on the first page), the slice bounds on the first key
+    column when given, then the page size. conditions are extra WHERE terms
+    without parameters.
+    """
+    names = ", ".join(f'"{name}"' for name in columns)
+    key_list = ", ".join(f'"{name}"' for name in key)
+    conditions = list(conditions)
+    params = 0
+    if not first_page:
+        placeholders = ", ".join(f"${params + i}" for i in range(1, len(key) + 1))
+        conditions.append(f"({key_list}) > ({placeholders})")
+        params += len(key)
+    if lower is not None:
+        params += 1
+        conditions.append(f'"{key[0]}" >= ${params}')
+    if upper is not None:
+        params += 1
+        conditions.append(f'"{key[0]}" {"<=" if upper_inclusive else "<"} ${params}')
+
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return f'SELECT {names} FROM "{table}"{where} ORDER BY {key_list} LIMIT ${params + 1}'
+
+def split_range(low, high, workers):
+    """Split [low, high] into workers contiguous slices of a number, timestamp or UUID key"""
+    if isinstance(low, uuid.UUID):
+        # UUIDs sort like their 128-bit integer value
+        return [
+            (uuid.UUID(int=start), uuid.UUID(int=end))
+            for start, end in split_range(low.int, high.int, workers)
+        ]
+    bounds = [low + (high - low) * i // workers for i in range(workers)] + [high]
+    # A narrow range gives fewer slices than workers
+    return [(bounds[i], bounds[i + 1]) for i in range(workers) if bounds[i] != bounds[i + 1]] or [(low, high)]
+
+def part_path(output, index, workers):
+    """Name of the file one worker writes"""
+    if workers == 1:
+        return output
+    base, extension = os.path.splitext(output)
+    return f"{base}.part-{index}{extension}"
+
+async def get_column_types(conn, table):
+    """Return {column: Postgres type} for a table, in table order"""
+    rows = await conn.fetch(
+        "SELECT column_name, data_type FROM information_schema.columns "
+        "WHERE table_schema = 'public' AND table_name = $1 ORDER BY ordinal_position",
+        table
+    )
+    return {row["column_name"]: row["data_type"] for row in rows}
+
+async def connect(dsn):
+    """Open a connection that decodes JSON columns into Python objects"""
+    conn = await asyncpg.connect(dsn)
+    for json_type in ("json", "jsonb"):
+        await conn.set_type_codec(json_type, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+    return conn
+
+class Exporter:
+    """Exports one table with keyset pagination, optionally split across workers"""
+
+    def __init__(self, dsn, table, key, columns, column_types, file_format, page_size=PAGE_SIZE):
+        self.dsn = dsn
+        self.table = table
+        self.key = key
+        self.columns = columns
+        self.column_types = column_types
+        self.file_format = file_format
+        self.page_size = page_size
+        # Key columns are always fetched, to know where the next page starts
+        self.fetch_columns = columns + [name for name in key if name not in columns]
+        self.rows_exported = 0
+        self.started = time.perf_counter()
+
+    async def walk(self, conn, writer, key, conditions=(), lower=None, upper=None, upper_inclusive=True, label="", rows_written=0):
+        """Write every row matching conditions and the slice bounds, page by page in key order; returns rows_written plus those"""
+        bounds = [value for value in (lower, upper) if value is not None]
+        first_sql = build_page_sql(self.table, self.fetch_columns, key, True, lower, upper, upper_inclusive, conditions)
+        next_sql = build_page_sql(self.table, self.fetch_columns, key, False, lower, upper, upper_inclusive, conditions)
+
+        records = await conn.fetch(first_sql, *bounds, self.page_size)
+        while records:
+            writer.write_rows([{name: record[name] for name in self.columns} for record in records])
+            rows_written += len(records)
+            self.rows_exported += len(records)
+            self.print_progress(label, rows_written)
+            if len(records) < self.page_size:
+                break
+            last_key = [records[-1][name] for name in key]
+            records = await conn.fetch(next_sql, *last_key, *bounds, self.page_size)
+        return rows_written
+
+    async def export_slice(self, path, lower=None, upper=None, upper_inclusive=True, include_nulls=True, label=""):
+        """Export the rows whose first key column is within [lower, upper] to path
+
+        If the first key column is nullable, the rows where it is NULL come
+        first, when include_nulls is set; one slice of a split export takes them.
+        """
+        conn = await connect(self.dsn)
+        writer = WRITERS[self.file_format](path, self.columns, self.column_types)
+        rows_written = 0
+        try:
+            conditions = []
+            if self.key[0] in NULLABLE_KEY_COLUMNS.get(self.table, ()):
+                if include_nulls:
+                    rows_written = await self.walk(conn, writer, self.key[1:], [f'"{self.key[0]}" IS NULL'], label=label)
+                conditions.append(f'"{self.key[0]}" IS NOT NULL')
+            rows_written = await self.walk(conn, writer, self.key, conditions, lower, upper, upper_inclusive, label, rows_written)
+        finally:
+            writer.close()
+            await conn.close()
+        return rows_written
+
+    async def run(self, output, workers=1):
+        """Export the table to output, or to one part file per worker"""
+        if workers == 1:
+            return await self.export_slice(output)
+
+        conn = await connect(self.dsn)
+        try:
+            first = f'"{self.key[0]}"'
+            bounds = await conn.fetchrow(f'SELECT min({first}) AS low, max({first}) AS high FROM "{self.table}"')
+        finally:
+            await conn.close()
+        if bounds["low"] is None:
+            # Empty table (or only NULL keys): still leave a (header-only) file behind
+            return await self.export_slice(part_path(output, 0, workers))
+
+        slices = split_range(bounds["low"], bounds["high"], workers)
+        counts = await asyncio.gather(*(
+            self.export_slice(
+                part_path(output, index, workers), lower, upper,
+                upper_inclusive=index == len(slices) - 1, include_nulls=index == 0, label=f" part {index}"
+            )
+            for index, (lower, upper) in enumerate(slices)
+        ))
+        return sum(counts)
+
+    def print_progress(self, label, rows_written):
+        elapsed = time.perf_counter() - self.started
+        rate = self.rows_exported / elapsed if elapsed > 0 else 0
+        print(f"{self.table}{label}: {rows_written} rows ({self.rows_exported} total, {rate:.0f} rows/s)")
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Export device_specs or a history table to JSON Lines, CSV or Parquet")
+    parser.add_argument("table", nargs="?", default="device_specs", choices=sorted(TABLE_KEYS), help="table to export (default: device_specs)")
+    parser.add_argument("--dsn", default=DEFAULT_DSN, help="Postgres connection string (default: $DATABASE_URL or a local postgres)")
+    parser.add_argument("--format", choices=sorted(WRITERS), default="jsonl", help="output format (default: jsonl)")
+    parser.add_argument("--output", help="file to write (default: <table>.<format>)")
+    parser.add_argument("--columns", help="comma-separated columns to export (default: all)")
+    parser.add_argument("--key", help="comma-separated key to page by, e.g. created_at,id (default: the table's primary key)")
+    parser.add_argument("--page-size", type=int, default=PAGE_SIZE, help=f"rows per query (default: {PAGE_SIZE})")
+    parser.add_argument("--workers", type=int, default=1, help="export this many key ranges in parallel, one part file each (default: 1)")
+    return parser.parse_args(argv)
+
+async def run_export(args):
+    """Check the requested columns and key, then export"""
+    conn = await connect(args.dsn)
+    try:
+        column_types = await get_column_types(conn, args.table)
+    finally:
+        await conn.close()
+    if not column_types:
+        print(f"Table {args.table} doesn't exist")
+        return
+
+    columns = [name.strip() for name in args.columns.split(",")] if args.columns else list(column_types)
+    unknown = [name for name in columns if name not in column_types]
+    if unknown:
+        print(f"Unknown columns for {args.table}: {', '.join(unknown)}")
+        return
+
+    key = TABLE_KEYS[args.table]
+    if args.key:
+        key = tuple(name.strip() for name in args.key.split(","))
+        if key not in [TABLE_KEYS[args.table]] + ALTERNATE_KEYS.get(args.table, []):
+            print(f"{args.table} has no index on ({', '.join(key)}) to page by")
+            return
+
+    output = args.output or args.table + FORMAT_EXTENSIONS[args.format]
+    exporter = Exporter(args.dsn, args.table, key, columns, column_types, args.format, args.page_size)
+    total = await exporter.run(output, max(1, args.workers))
+    elapsed = time.perf_counter() - exporter.started
+    print(f"Exported {total} rows from {args.table} in {elapsed:.1f}s")
+
+def main():
+    args = parse_args()
+    if asyncpg is None:
+        print("The exporter needs asyncpg: pip install asyncpg")
+        return
+    if args.format == "parquet" and pyarrow is None:
+        print("Parquet output needs pyarrow: pip install pyarrow")
+        return
+
+    try:
+        asyncio.run(run_export(args))
+    except KeyboardInterrupt:
+        print("Export stopped")
+
+if __name__ == "__main__":
+    main()
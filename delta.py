@@ -0,0 +1,69 @@
+import hashlib
+import json
+import os
+
+# Local record of what the server last acknowledged, kept next to system_info.json
+DELTA_STATE_FILE = "delta_state.json"
+
+# Send a full report after this many partial ones, in case the server row was lost
+FULL_RESYNC_EVERY = 60
+
+# Fields included in every report, partial or not
+ALWAYS_SENT = ("device_id", "timestamp")
+
+def section_hash(value):
+    """Hash a report section so it can be compared with the last acknowledged upload"""
+    encoded = json.dumps(value, sort_keys=True, separators=(",", ":")).encode()
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+class DeltaTracker:
+    """Tracks per-section hashes of the last acknowledged upload for each device"""
+
+    def __init__(self, path=DELTA_STATE_FILE, full_resync_every=FULL_RESYNC_EVERY):
+        self.path = path
+        self.full_resync_every = full_resync_every
+        try:
+            with open(path) as f:
+                self.state = json.load(f)
+        except (OSError, ValueError):
+            # Missing or corrupt state, the next upload will be a full one
+            self.state = {}
+
+    def diff(self, report):
+        """Return (partial_report, hashes) with only the sections changed since the last acknowledged upload"""
+        hashes = {key: section_hash(value) for key, value in report.items()}
+        device_state = self.state.get(report["device_id"])
+
+        # Full report for new devices and on every forced resync
+        if device_state is None or device_state["partial_count"] >= self.full_resync_every:
+            return dict(report), hashes
+
+        acked = device_state["hashes"]
+        partial = {
+            key: value for key, value in report.items()
+            if key in ALWAYS_SENT or acked.get(key) != hashes[key]
+        }
+        return partial, hashes
+
+    def ack(self, partial, hashes):
+        """Record that the server has accepted partial, computed from a report with these hashes"""
+        device_id = partial["device_id"]
+        device_state = self.state.get(device_id)
+
+        if device_state is None or len(partial) == len(hashes):
+            self.state[device_id] = {"hashes": hashes, "partial_count": 0}
+        else:
+            device_state["hashes"].update({key: hashes[key] for key in partial})
+            device_state["partial_count"] += 1
+
+        self.save()
+
+    def save(self):
+        """Write the state atomically so a crash can't leave it half-written"""
+        try:
+            tmp_file = self.path + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(self.state, f)
+            os.replace(tmp_file, self.path)
+        except OSError as e:
+            print(f"Error writing delta state: {e}")
@@ -0,0 +1,232 @@
+import os
+import queue
+import re
+import select
+import threading
+import time
+
+import psutil
+
+MOUNTINFO_FILE = "/proc/self/mountinfo"
+
+# Filesystems that never hold user data: kernel interfaces, container layers,
+# in-memory mounts and read-only snap images
+PSEUDO_FILESYSTEMS = {
+    "autofs", "binfmt_misc", "bpf", "cgroup", "cgroup2", "configfs", "debugfs",
+    "devpts", "devtmpfs", "efivarfs", "fusectl", "hugetlbfs", "mqueue", "nsfs",
+    "overlay", "proc", "pstore", "ramfs", "rpc_pipefs", "securityfs", "selinuxfs",
+    "squashfs", "sysfs", "tmpfs", "tracefs", "nfsd", "fuse.lxcfs", "fuse.gvfsd-fuse",
+    "fuse.portal", "fuse.snapfuse", "shm", "none"
+}
+
+# statvfs calls run on this many worker threads, each mount answering within STATVFS_TIMEOUT
+DISK_WORKERS = 8
+STATVFS_TIMEOUT = 1.0
+
+# Keep the report bounded on hosts with many real volumes; the largest are kept
+DISK_REPORT_LIMIT = 64
+
+def unescape_mount_field(value):
+    """Undo the octal escapes mountinfo uses for spaces, tabs, newlines and backslashes"""
+    return re.sub(r"\\([0-7]{3})", lambda match: chr(int(match.group(1), 8)), value)
+
+def parse_mountinfo(text):
+    """Parse /proc/self/mountinfo into dicts with device, mountpoint, file_system_type, dev and root"""
+    mounts = []
+    for line in text.splitlines():
+        fields = line.split()
+        try:
+            separator = fields.index("-", 6)
+        except ValueError:
+            continue
+        mounts.append({
+            "device": unescape_mount_field(fields[separator + 2]),
+            "mountpoint": unescape_mount_field(fields[4]),
+            "file_system_type": fields[separator + 1],
+            "dev": fields[2],
+            "root": unescape_mount_field(fields[3])
+        })
+    return mounts
+
+def filter_mounts(mounts):
+    """Drop pseudo filesystems and keep one mount per underlying device
+
+    Bind mounts share the major:minor of the filesystem they expose. The
+    mount of the filesystem root is preferred, then the shortest path.
+    """
+    best = {}
+    for mount in mounts:
+        if mount["file_system_type"] in PSEUDO_FILESYSTEMS:
+            continue
+        rank = (mount["root"] != "/", len(mount["mountpoint"]), mount["mountpoint"])
+        current = best.get(mount["dev"])
+        if current is None or rank < current[0]:
+            best[mount["dev"]] = (rank, mount)
+
+    # Keep the mount table's order so the report (and its delta hash) is stable
+    kept = {id(mount) for _, mount in best.values()}
+    return [
+        {"device": mount["device"], "mountpoint": mount["mountpoint"], "file_system_type": mount["file_system_type"]}
+        for mount in mounts if id(mount) in kept
+    ]
+
+class MountTable:
+    """The filtered mount table, re-read only when the kernel says it changed
+
+    The kernel flags an open /proc/self/mountinfo with POLLPRI when a mount is
+    added or removed, so checking for changes is one poll() call. Where that
+    isn't available (other platforms) psutil.disk_partitions() is used each time.
+    """
+
+    def __init__(self, path=MOUNTINFO_FILE):
+        self.path = path
+        self.partitions = None
+        self.lock = threading.Lock()
+        self.fd = None
+        self.poller = None
+        if hasattr(select, "poll") and os.path.exists(path):
+            self.fd = os.open(path, os.O_RDONLY)
+            self.poller = select.poll()
+            self.poller.register(self.fd, select.POLLPRI | select.POLLERR)
+
+    def read(self):
+        """Read the whole file from the start, which also clears the change flag"""
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        chunks = []
+        while True:
+            chunk = os.read(self.fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks).decode("utf-8", "replace")
+
+    def get(self):
+        """Return the list of partitions worth reporting"""
+        if self.fd is None:
+            return [
+                {"device": partition.device, "mountpoint": partition.mountpoint, "file_system_type": partition.fstype}
+                for partition in psutil.disk_partitions()
+                if partition.fstype not in PSEUDO_FILESYSTEMS
+            ]
+
+        with self.lock:
+            if self.partitions is None or self.poller.poll(0):
+                self.partitions = filter_mounts(parse_mountinfo(self.read()))
+            return self.partitions
+
+    def close(self):
+        if self.fd is not None:
+            self.poller.unregister(self.fd)
+            os.close(self.fd)
+            self.fd = None
+
+def disk_usage(mountpoint):
+    """statvfs a mountpoint, computing the same numbers as psutil.disk_usage()"""
+    if not hasattr(os, "statvfs"):
+        usage = psutil.disk_usage(mountpoint)
+        return usage.total, usage.used, usage.free, usage.percent
+
+    stats = os.statvfs(mountpoint)
+    total = stats.f_blocks * stats.f_frsize
+    free = stats.f_bavail * stats.f_frsize
+    used = (stats.f_blocks - stats.f_bfree) * stats.f_frsize
+    # Like df, percent is of the space available to unprivileged users
+    available_total = used + free
+    percent = round(used / available_total * 100, 1) if available_total else 0.0
+    return total, used, free, percent
+
+class DiskUsageReader:
+    """Runs statvfs on a pool of daemon threads with a per-mount timeout
+
+    A mount that doesn't answer in time (a dead NFS server, say) is reported
+    with an error and skipped until its pending call returns, and a spare
+    worker is started so the hung call doesn't shrink the pool.
+    """
+
+    def __init__(self, workers=DISK_WORKERS, timeout=STATVFS_TIMEOUT):
+        self.workers = workers
+        self.timeout = timeout
+        self.tasks = queue.Queue()
+        self.in_flight = set()
+        self.threads = 0
+        self.lock = threading.Lock()
+
+    def worker(self):
+        while True:
+            task = self.tasks.get()
+            if task is None:
+                # close() was called
+                return
+            mountpoint, results = task
+            try:
+                usage = disk_usage(mountpoint)
+            except OSError as e:
+                usage = e
+            with self.lock:
+                self.in_flight.discard(mountpoint)
+            results.put((mountpoint, usage))
+
+    def ensure_workers(self, wanted, hung):
+        """Start workers until there are wanted ones plus one per hung call"""
+        with self.lock:
+            target = min(self.workers, wanted) + hung
+            while self.threads < target:
+                threading.Thread(target=self.worker, name=f"statvfs-{self.threads}", daemon=True).start()
+                self.threads += 1
+
+    def close(self):
+        """Stop the idle workers; one stuck in statvfs exits when its call returns"""
+        with self.lock:
+            for _ in range(self.threads):
+                self.tasks.put(None)
+            self.threads = 0
+
+    def read(self, partitions, disk_info=None):
+        """Fill disk_info with the usage of each partition, in partition order, once every mount has answered or timed out"""
+        if disk_info is None:
+            disk_info = []
+        results = queue.Queue()
+        entries = {}
+        queued = 0
+        with self.lock:
+            hung = len(self.in_flight)
+            for partition in partitions:
+                if partition["mountpoint"] in self.in_flight:
+                    # Still stuck from an earlier sample
+                    continue
+                self.in_flight.add(partition["mountpoint"])
+                self.tasks.put((partition["mountpoint"], results))
+                queued += 1
+        self.ensure_workers(queued, hung)
+
+        deadline = time.monotonic() + self.timeout
+        while len(entries) < queued:
+            try:
+                mountpoint, usage = results.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            entries[mountpoint] = usage
+
+        for partition in partitions:
+            usage = entries.get(partition["mountpoint"])
+            if isinstance(usage, OSError):
+                # Some disk partitions aren't accessible
+                continue
+            entry = {
+                "device": partition["device"],
+                "mountpoint": partition["mountpoint"],
+                "file_system_type": partition["file_system_type"]
+            }
+            if usage is None:
+                entry["error"] = f"statvfs did not answer within {self.timeout}s"
+            else:
+                entry["total_size"], entry["used"], entry["free"], entry["percent_used"] = usage
+            disk_info.append(entry)
+
+        if len(disk_info) > DISK_REPORT_LIMIT:
+            dropped = len(disk_info) - DISK_REPORT_LIMIT
+            largest = sorted(disk_info, key=lambda disk: disk.get("total_size", 0), reverse=True)[:DISK_REPORT_LIMIT]
+            keep = {id(disk) for disk in largest}
+            disk_info[:] = [disk for disk in disk_info if id(disk) in keep]
+            disk_info.append({"error": f"{dropped} smaller mounts not reported"})
+        return disk_info
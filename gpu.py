@@ -0,0 +1,250 @@
+import atexit
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+# NVML bindings, imported by detect_gpu_backend() so hosts without a GPU never load them
+pynvml = None
+
+# Command used by the nvidia-smi backend; point it elsewhere to use a stub
+NVIDIA_SMI = os.environ.get("SPECTRE_NVIDIA_SMI", "nvidia-smi")
+
+# How often the persistent nvidia-smi process prints a sample
+NVIDIA_SMI_LOOP_MS = 1000
+
+# How long to wait for the first nvidia-smi sample, and between restarts if it exits
+FIRST_SAMPLE_TIMEOUT = 5
+RESTART_BACKOFF = 30
+
+# Remembers that this host has no GPU, so later runs skip detection entirely
+GPU_CACHE_FILE = "gpu_cache.json"
+
+NVIDIA_SMI_FIELDS = "index,name,utilization.gpu,memory.total,memory.used,memory.free,temperature.gpu"
+
+def import_pynvml():
+    """Import the NVML bindings on first use; returns None if they aren't installed"""
+    global pynvml
+    if pynvml is None:
+        try:
+            import pynvml as module
+        except ImportError:
+            return None
+        pynvml = module
+    return pynvml
+
+def parse_number(value):
+    """Parse an nvidia-smi number, which is "[N/A]" or "[Not Supported]" when unavailable"""
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+def parse_nvidia_smi_line(line):
+    """Turn one line of nvidia-smi --format=csv,noheader,nounits output into a gpu_info entry"""
+    fields = [field.strip() for field in line.split(",")]
+    if len(fields) < 7:
+        return None
+    # The name is the only field that may itself contain commas
+    index, name, load, memory_total, memory_used, memory_free, temperature = (
+        fields[0], ", ".join(fields[1:-5]), *fields[-5:]
+    )
+    try:
+        index = int(index)
+    except ValueError:
+        return None
+    load = parse_number(load)
+    return {
+        "id": index,
+        "name": name,
+        "load": load / 100 if load is not None else None,
+        "memory_total": parse_number(memory_total),
+        "memory_used": parse_number(memory_used),
+        "memory_free": parse_number(memory_free),
+        "temperature": parse_number(temperature)
+    }
+
+class NoGpuBackend:
+    """Backend for hosts without an NVIDIA GPU"""
+    name = "none"
+
+    def sample(self):
+        return []
+
+    def close(self):
+        pass
+
+class NvmlBackend:
+    """Reads GPU state straight from the driver through NVML, with no subprocess"""
+    name = "nvml"
+
+    def __init__(self):
+        self.handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount())]
+        self.names = []
+        for handle in self.handles:
+            name = pynvml.nvmlDeviceGetName(handle)
+            # Older bindings return bytes
+            self.names.append(name.decode() if isinstance(name, bytes) else name)
+
+    def sample(self):
+        gpu_info = []
+        for index, handle in enumerate(self.handles):
+            try:
+                utilization = pynvml.nvmlDeviceGetUtilizationRates(handle)
+                memory = pynvml.nvmlDeviceGetMemoryInfo(handle)
+                temperature = pynvml.nvmlDeviceGetTemperature(handle, pynvml.NVML_TEMPERATURE_GPU)
+            except pynvml.NVMLError as e:
+                gpu_info.append({"id": index, "error": str(e)})
+                continue
+            # Same units as GPUtil: load as a fraction, memory in MB
+            gpu_info.append({
+                "id": index,
+                "name": self.names[index],
+                "load": utilization.gpu / 100,
+                "memory_total": memory.total / (1024 * 1024),
+                "memory_used": memory.used / (1024 * 1024),
+                "memory_free": memory.free / (1024 * 1024),
+                "temperature": temperature
+            })
+        return gpu_info
+
+    def close(self):
+        try:
+            pynvml.nvmlShutdown()
+        except pynvml.NVMLError:
+            pass
+
+class NvidiaSmiBackend:
+    """Keeps one nvidia-smi --loop-ms process running and serves its latest output
+
+    A reader thread parses each line as it arrives and keeps the newest entry
+    per GPU, so sample() only copies them instead of forking nvidia-smi.
+    """
+    name = "nvidia-smi"
+
+    def __init__(self, command=NVIDIA_SMI, loop_ms=NVIDIA_SMI_LOOP_MS):
+        self.command = command
+        self.loop_ms = loop_ms
+        self.latest = {}
+        self.lock = threading.Lock()
+        self.first_sample = threading.Event()
+        self.process = None
+        self.started_at = 0
+        self.start()
+
+    def start(self):
+        """Start (or restart) the nvidia-smi process and its reader thread"""
+        self.started_at = time.monotonic()
+        process = subprocess.Popen(
+            [self.command, f"--query-gpu={NVIDIA_SMI_FIELDS}", "--format=csv,noheader,nounits", f"--loop-ms={self.loop_ms}"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1
+        )
+        # Readings of a process that died are not served as live ones
+        with self.lock:
+            self.process = process
+            self.latest = {}
+            self.first_sample = threading.Event()
+        threading.Thread(target=self.read_output, args=(process,), name="nvidia-smi-reader", daemon=True).start()
+
+    def read_output(self, process):
+        """Reader thread: keep the newest parsed line for each GPU"""
+        for line in process.stdout:
+            gpu = parse_nvidia_smi_line(line)
+            if gpu is None:
+                continue
+            with self.lock:
+                if process is not self.process:
+                    # Output still buffered from a process that has been replaced
+                    break
+                self.latest[gpu["id"]] = gpu
+                self.first_sample.set()
+        process.stdout.close()
+
+    def sample(self):
+        if self.process.poll() is not None:
+            # nvidia-smi exited; restart it, but not more than once per RESTART_BACKOFF
+            if time.monotonic() - self.started_at < RESTART_BACKOFF:
+                return [{"error": f"nvidia-smi exited with status {self.process.returncode}"}]
+            self.start()
+
+        self.first_sample.wait(FIRST_SAMPLE_TIMEOUT)
+        with self.lock:
+            if not self.latest:
+                return [{"error": "no output from nvidia-smi"}]
+            return [dict(self.latest[index]) for index in sorted(self.latest)]
+
+    def close(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+def load_gpu_cache(cache_key):
+    """Return True if an earlier run on this cache_key found no GPU"""
+    try:
+        with open(GPU_CACHE_FILE) as f:
+            cache = json.load(f)
+        return cache.get("cache_key") == cache_key and cache.get("has_gpu") is False
+    except (OSError, ValueError):
+        return False
+
+def save_gpu_cache(cache_key):
+    """Remember that this host has no GPU"""
+    try:
+        tmp_file = GPU_CACHE_FILE + ".tmp"
+        with open(tmp_file, "w") as f:
+            json.dump({"cache_key": cache_key, "has_gpu": False, "checked_at": int(time.time())}, f)
+        os.replace(tmp_file, GPU_CACHE_FILE)
+    except OSError as e:
+        print(f"Error writing GPU cache: {e}")
+
+def detect_gpu_backend(cache_key=None):
+    """Pick the cheapest way to read GPU state on this host
+
+    NVML when the bindings and driver are there, otherwise a persistent
+    nvidia-smi process, otherwise no GPU. A no-GPU result is saved for
+    cache_key (the device cache's hardware key) so later runs skip detection.
+    """
+    if cache_key is not None and load_gpu_cache(cache_key):
+        return NoGpuBackend()
+
+    backend = None
+    # A hung driver says nothing about the hardware, so only a clear answer is cached
+    definite = True
+    if import_pynvml() is not None:
+        try:
+            pynvml.nvmlInit()
+            if pynvml.nvmlDeviceGetCount() > 0:
+                backend = NvmlBackend()
+            else:
+                pynvml.nvmlShutdown()
+                backend = NoGpuBackend()
+        except pynvml.NVMLError:
+            # No driver library; nvidia-smi may still work
+            pass
+
+    if backend is None:
+        command = shutil.which(NVIDIA_SMI)
+        if command is None:
+            backend = NoGpuBackend()
+        else:
+            # nvidia-smi -L is quick and fails or lists nothing when there is no GPU
+            try:
+                listing = subprocess.run([command, "-L"], capture_output=True, text=True, timeout=10)
+                has_gpu = listing.returncode == 0 and "GPU " in listing.stdout
+            except (OSError, subprocess.TimeoutExpired):
+                has_gpu = False
+                definite = False
+            backend = NvidiaSmiBackend(command) if has_gpu else NoGpuBackend()
+
+    if backend.name == "none" and definite and cache_key is not None:
+        save_gpu_cache(cache_key)
+    atexit.register(backend.close)
+    return backend
@@ -0,0 +1,506 @@
+"""Synthetic fleet load generator for the upload and ingest path.
+
+Builds reports with the get_system_info() schema for a fleet of fake devices.
+Each device gets a stable device_id and hardware inventory from (seed, index),
+so two runs with the same seed write the same rows. Fleets mix laptops,
+desktops, servers, GPU nodes and Kubernetes nodes, so disk, GPU, network and
+cgroup counts vary the way they do in a real fleet.
+
+Reports are replayed round-robin, the way every device reporting once per
+interval would arrive, at --rate reports per second with at most
+--concurrency requests in flight. Requests are sent on an open-loop schedule:
+latency counts from when a request was due, so a server that falls behind
+shows up as latency instead of as a lower send rate. If many requests start
+late, the generator itself is the bottleneck: give it its own cores, or batch
+reports with --batch-size.
+
+Targets:
+
+    python load_generator.py                       # built-in HTTP stub
+    python load_generator.py --url http://localhost:54321 --key <anon key>    # supabase start
+    python load_generator.py --url http://localhost:3000 --rest-prefix ""    # bare PostgREST
+    python load_generator.py --url http://localhost:8080 --gateway           # ingest_gateway.py
+
+--write-reports fleet.jsonl writes the reports instead of sending them, for
+bulk_import.py or for inspecting what is generated.
+"""
+import argparse
+import asyncio
+import http.server
+import json
+import multiprocessing
+import random
+import time
+import uuid
+
+import httpx
+
+from schema import get_metrics_row
+from benchmark import StubHandler, summarize
+from payload import encode_body, load_zstd_dictionary, CONTENT_ENCODINGS, ZSTD_DICT_FILE
+
+# Load configuration
+FLEET_DEVICES = 50000
+TARGET_RATE = 200
+CONCURRENCY = 50
+DURATION = 30
+REPORT_INTERVAL = 60
+REQUEST_TIMEOUT = 30
+RESULTS_FILE = "load_results.json"
+
+# A request that starts this long after it was due means the generator itself could not keep up
+LATE_START_SECONDS = 0.01
+
+# Upper bounds of the latency histogram buckets, in milliseconds
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+# Namespace for fake device ids, so they can never collide with real uuid5 ids
+FLEET_NAMESPACE = uuid.uuid5(uuid.UUID("00000000-0000-0000-0000-000000000000"), "spectre-load-generator")
+
+# Device kinds: (name, share of the fleet, hardware ranges)
+PROFILES = [
+    ("laptop", 0.45, {
+        "systems": ["Windows", "Windows", "Darwin", "Linux"],
+        "cores": [4, 6, 8, 12, 16], "memory_gb": [8, 16, 16, 32],
+        "disks": (1, 2), "gpus": [0, 0, 1], "interfaces": (1, 3), "cgroups": (0, 0)
+    }),
+    ("desktop", 0.2, {
+        "systems": ["Windows", "Windows", "Linux"],
+        "cores": [6, 8, 12, 16, 24], "memory_gb": [16, 32, 64],
+        "disks": (1, 4), "gpus": [0, 1, 1, 2], "interfaces": (1, 2), "cgroups": (0, 0)
+    }),
+    ("server", 0.2, {
+        "systems": ["Linux"],
+        "cores": [16, 32, 64, 128], "memory_gb": [64, 128, 256, 512, 1024],
+        "disks": (2, 24), "gpus": [0], "interfaces": (2, 8), "cgroups": (10, 50)
+    }),
+    ("gpu_node", 0.05, {
+        "systems": ["Linux"],
+        "cores": [32, 64, 96], "memory_gb": [256, 512, 1024],
+        "disks": (2, 8), "gpus": [4, 8, 8], "interfaces": (4, 12), "cgroups": (10, 40)
+    }),
+    ("k8s_node", 0.1, {
+        "systems": ["Linux"],
+        "cores": [8, 16, 32, 64], "memory_gb": [32, 64, 128, 256],
+        "disks": (1, 4), "gpus": [0], "interfaces": (20, 150), "cgroups": (50, 80)
+    }),
+]
+
+CPU_BRANDS = {
+    "Windows": ["AMD Ryzen 5 5600H with Radeon Graphics", "Intel(R) Core(TM) i7-1165G7 @ 2.80GHz", "AMD Ryzen 9 7950X 16-Core Processor"],
+    "Darwin": ["Apple M1", "Apple M2 Pro", "Apple M3 Max"],
+    "Linux": ["Intel(R) Xeon(R) Gold 6338 CPU @ 2.00GHz", "AMD EPYC 7763 64-Core Processor", "Intel(R) Core(TM) i9-12900K"]
+}
+GPU_NAMES = ["NVIDIA GeForce RTX 3060 Laptop GPU", "NVIDIA GeForce RTX 4090", "NVIDIA A100-SXM4-80GB", "NVIDIA H100 80GB HBM3"]
+GPU_MEMORY_MB = {"NVIDIA GeForce RTX 3060 Laptop GPU": 6144, "NVIDIA GeForce RTX 4090": 24564, "NVIDIA A100-SXM4-80GB": 81920, "NVIDIA H100 80GB HBM3": 81559}
+PROCESS_NAMES = ["chrome", "python", "postgres", "java", "node", "dockerd", "containerd", "kubelet", "sshd", "systemd", "explorer.exe", "Code", "nginx", "redis-server"]
+RELEASES = {"Windows": ("11", "10.0.26100"), "Darwin": ("23.4.0", "Darwin Kernel Version 23.4.0"), "Linux": ("6.8.0-45-generic", "#45-Ubuntu SMP PREEMPT_DYNAMIC")}
+
+class SyntheticFleet:
+    """Deterministic fake devices; report(index, sequence) is the same for the same seed
+
+    Nothing is cached, so a 50k-device fleet costs no memory: a device's
+    inventory is rebuilt from its own random generator each time it reports.
+    """
+
+    def __init__(self, devices=FLEET_DEVICES, seed=0, interval=REPORT_INTERVAL, start=None):
+        self.devices = devices
+        self.seed = seed
+        self.interval = interval
+        self.start = int(start if start is not None else time.time())
+        self.weights = [share for _, share, _ in PROFILES]
+
+    def device_id(self, index):
+        return str(uuid.uuid5(FLEET_NAMESPACE, f"{self.seed}:{index}"))
+
+    def profile(self, index):
+        """Return (profile name, ranges) for a device"""
+        rng = random.Random(f"{self.seed}:{index}:profile")
+        name, _, ranges = rng.choices(PROFILES, self.weights)[0]
+        return name, ranges
+
+    def inventory(self, index):
+        """The static part of a device: system, CPU, memory size and its disks, GPUs and interfaces"""
+        kind, ranges = self.profile(index)
+        rng = random.Random(f"{self.seed}:{index}:inventory")
+        system = rng.choice(ranges["systems"])
+        cores = rng.choice(ranges["cores"])
+        windows = system == "Windows"
+
+        disks = []
+        for number in range(rng.randint(*ranges["disks"])):
+            if windows:
+                device = mountpoint = f"{chr(ord('C') + number)}:\\"
+                file_system_type = "NTFS"
+            elif system == "Darwin":
+                device = f"/dev/disk{number + 1}s1"
+                mountpoint = "/" if number == 0 else f"/Volumes/Disk{number}"
+                file_system_type = "apfs"
+            else:
+                device = f"/dev/nvme{number}n1p1" if number < 4 else f"/dev/sd{chr(ord('a') + number % 26)}{number // 26 + 1}"
+                mountpoint = "/" if number == 0 else f"/data{number}"
+                file_system_type = rng.choice(["ext4", "xfs"])
+            disks.append({
+                "device": device,
+                "mountpoint": mountpoint,
+                "file_system_type": file_system_type,
+                "total_size": rng.choice([256, 512, 1024, 2048, 4096, 8192]) * 1000 ** 3
+            })
+
+        gpu_name = rng.choice(GPU_NAMES[2:] if kind == "gpu_node" else GPU_NAMES[:2])
+        gpus = [{"id": number, "name": gpu_name, "memory_total": float(GPU_MEMORY_MB[gpu_name])} for number in range(rng.choice(ranges["gpus"]))]
+
+        interfaces = []
+        for number in range(rng.randint(*ranges["interfaces"])):
+            if kind == "k8s_node" and number > 1:
+                name = f"cali{rng.getrandbits(40):010x}"
+                ip, netmask = f"10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}", "255.255.255.255"
+            else:
+                name = ("Ethernet " if windows else "eth") + str(number)
+                ip, netmask = f"192.168.{number}.{index % 254 + 1}", "255.255.255.0"
+            interfaces.append({"interface": name, "ip": ip, "netmask": netmask, "broadcast": None})
+
+        cgroups = [
+            f"/kubepods.slice/kubepods-burstable.slice/pod{rng.getrandbits(32):08x}" if kind == "k8s_node" else f"/system.slice/service-{number}.service"
+            for number in range(rng.randint(*ranges["cgroups"]))
+        ]
+
+        release, version = RELEASES[system]
+        return {
+            "kind": kind,
+            "system": system,
+            "node_name": f"{kind}-{index:06d}",
+            "release": release,
+            "version": version,
+            "machine": "arm64" if system == "Darwin" else ("AMD64" if windows else "x86_64"),
+            "cpu_brand": rng.choice(CPU_BRANDS[system]),
+            "cores": cores,
+            "frequency": float(rng.choice([2000, 2400, 3000, 3301, 3700])),
+            "memory_total": rng.choice(ranges["memory_gb"]) * 1024 ** 3,
+            "disks": disks,
+            "gpus": gpus,
+            "interfaces": interfaces,
+            "cgroups": cgroups
+        }
+
+    def report(self, index, sequence=0):
+        """The sequence-th report of device index, sent interval seconds after the one before"""
+        inventory = self.inventory(index)
+        rng = random.Random(f"{self.seed}:{index}:{sequence}")
+        timestamp = self.start + sequence * self.interval
+        memory_percent_used = round(rng.uniform(15, 95), 1)
+
+        disk_info = []
+        for disk in inventory["disks"]:
+            percent_used = round(rng.uniform(5, 98), 1)
+            used = int(disk["total_size"] * percent_used / 100)
+            disk_info.append(dict(disk, used=used, free=disk["total_size"] - used, percent_used=percent_used))
+
+        gpu_info = []
+        for gpu in inventory["gpus"]:
+            memory_used = round(gpu["memory_total"] * rng.uniform(0, 0.95))
+            gpu_info.append(dict(gpu, load=round(rng.random(), 2), memory_used=float(memory_used),
+                                 memory_free=gpu["memory_total"] - memory_used, temperature=float(rng.randint(35, 85))))
+
+        top_processes = []
+        for pid in rng.sample(range(300, 65536), 10 if inventory["kind"] in ("laptop", "desktop") else 20):
+            rss = rng.randint(10, 4000) * 1024 ** 2
+            top_processes.append({
+                "pid": pid,
+                "name": rng.choice(PROCESS_NAMES),
+                "cpu_percent": round(rng.expovariate(0.2), 1),
+                "memory_rss": rss,
+                "memory_percent": round(rss / inventory["memory_total"] * 100, 2)
+            })
+        top_processes.sort(key=lambda process: process["cpu_percent"], reverse=True)
+
+        cgroups = [
+            {
+                "path": path,
+                "memory_current": rng.randint(1, 8192) * 1024 ** 2,
+                "cpu_percent": round(rng.expovariate(0.1), 1),
+                "io_read_bytes_per_sec": rng.randint(0, 50 * 1024 ** 2),
+                "io_write_bytes_per_sec": rng.randint(0, 20 * 1024 ** 2)
+            }
+            for path in inventory["cgroups"]
+        ]
+        cgroups.sort(key=lambda cgroup: cgroup["cpu_percent"], reverse=True)
+        if len(cgroups) > 50:
+            dropped = len(cgroups) - 50
+            cgroups = cgroups[:50] + [{"error": f"{dropped} less busy cgroups not reported"}]
+
+        cpu_mean = rng.uniform(2, 80)
+        return {
+            "device_id": self.device_id(index),
+            "system": inventory["system"],
+            "node_name": inventory["node_name"],
+            "release": inventory["release"],
+            "version": inventory["version"],
+            "machine": inventory["machine"],
+            "processor": inventory["machine"],
+            "cpu_brand": inventory["cpu_brand"],
+            "cpu_cores_physical": inventory["cores"] // 2 if inventory["system"] != "Darwin" else inventory["cores"],
+            "cpu_cores_logical": inventory["cores"],
+            "cpu_frequency": {"current": inventory["frequency"] * rng.uniform(0.5, 1.2), "min": "Unknown", "max": inventory["frequency"]},
+            "memory_total": inventory["memory_total"],
+            "memory_available": int(inventory["memory_total"] * (100 - memory_percent_used) / 100),
+            "memory_percent_used": memory_percent_used,
+            "disk_info": disk_info,
+            "gpu_info": gpu_info,
+            "network_info": inventory["interfaces"],
+            "top_processes": top_processes,
+            "cgroups": cgroups,
+            "timestamp": timestamp,
+            "_agent_stats": {"spans": {}, "counters": {"upload.requests": sequence * 2}},
+            "metrics_window": {
+                "window_start": timestamp - self.interval,
+                "window_end": timestamp,
+                "interval": 1.0,
+                "samples": self.interval,
+                "cpu_percent": {"min": 0.0, "max": min(100.0, cpu_mean * 2), "mean": cpu_mean,
+                                "p50": cpu_mean, "p95": min(100.0, cpu_mean * 1.6), "p99": min(100.0, cpu_mean * 1.9)}
+            }
+        }
+
+    def reports(self, count):
+        """The first count reports in arrival order: every device once, then every device again"""
+        for number in range(count):
+            yield self.report(number % self.devices, number // self.devices)
+
+class LatencyHistogram:
+    """Counts of latencies in HISTOGRAM_BUCKETS_MS buckets, plus everything slower"""
+
+    def __init__(self, bounds_ms=HISTOGRAM_BUCKETS_MS):
+        self.bounds_ms = bounds_ms
+        self.counts = [0] * (len(bounds_ms) + 1)
+
+    def add(self, seconds):
+        milliseconds = seconds * 1000
+        for bucket, bound in enumerate(self.bounds_ms):
+            if milliseconds <= bound:
+                self.counts[bucket] += 1
+                return
+        self.counts[-1] += 1
+
+    def to_dict(self):
+        labels = [f"<={bound}ms" for bound in self.bounds_ms] + [f">{self.bounds_ms[-1]}ms"]
+        return dict(zip(labels, self.counts))
+
+    def render(self, width=40):
+        """Text bars, one line per non-empty bucket"""
+        total = sum(self.counts)
+        lines = []
+        for label, count in self.to_dict().items():
+            if count:
+                bar = "#" * max(1, round(count / total * width))
+                lines.append(f"  {label:>10} {count:8d} {count / total * 100:5.1f}% {bar}")
+        return "\n".join(lines)
+
+class LoadRun:
+    """Sends a fleet's reports on a fixed schedule and records what happened to each request"""
+
+    def __init__(self, fleet, url, key=None, rest_prefix="/rest/v1", gateway=False, with_metrics=False,
+                 rate=TARGET_RATE, concurrency=CONCURRENCY, batch_size=1, compression="identity", zstd_dictionary=None):
+        self.fleet = fleet
+        self.gateway = gateway
+        self.compression = compression
+        self.zstd_dictionary = zstd_dictionary
+        self.with_metrics = with_metrics
+        self.rate = rate
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        headers = {"Content-Type": "application/json"}
+        if key:
+            headers["apikey"] = key
+            headers["Authorization"] = f"Bearer {key}"
+        self.client = httpx.AsyncClient(
+            base_url=url.rstrip("/") + ("" if gateway else rest_prefix),
+            headers=headers,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            timeout=REQUEST_TIMEOUT
+        )
+        self.latency = []
+        self.service_time = []
+        self.histogram = LatencyHistogram()
+        self.statuses = {}
+        self.reports_sent = 0
+        self.bytes_sent = 0
+        self.late_starts = 0
+        self.generate_seconds = 0.0
+
+    async def post(self, path, rows, prefer=None, params=None):
+        """POST rows as compact JSON, compressed as configured, and raise for an error status"""
+        body = encode_body(json.dumps(rows, separators=(",", ":")).encode(), self.compression, self.zstd_dictionary)
+        self.bytes_sent += len(body)
+        headers = {"Prefer": prefer} if prefer else {}
+        if self.compression != "identity":
+            headers["Content-Encoding"] = self.compression
+        response = await self.client.post(path, content=body, params=params, headers=headers)
+        response.raise_for_status()
+
+    async def send(self, reports):
+        """One upload the way an agent does it: history rows first, then the specs upsert"""
+        if self.gateway:
+            await self.post("/ingest", reports)
+            return
+        if self.with_metrics:
+            await self.post("/device_metrics", [get_metrics_row(report) for report in reports],
+                            "resolution=ignore-duplicates,return=minimal", {"on_conflict": "device_id,ts"})
+        await self.post("/device_specs", reports if len(reports) > 1 else reports[0],
+                        "resolution=merge-duplicates,return=minimal", {"on_conflict": "device_id"})
+
+    async def request(self, reports, due, semaphore):
+        started = time.perf_counter()
+        try:
+            await self.send(reports)
+            outcome = "ok"
+        except httpx.HTTPStatusError as e:
+            outcome = str(e.response.status_code)
+        except httpx.HTTPError as e:
+            outcome = type(e).__name__
+        finally:
+            semaphore.release()
+        finished = time.perf_counter()
+
+        self.statuses[outcome] = self.statuses.get(outcome, 0) + 1
+        if outcome == "ok":
+            self.reports_sent += len(reports)
+            self.latency.append(finished - due)
+            self.service_time.append(finished - started)
+            self.histogram.add(finished - due)
+
+    async def run(self, total_reports):
+        """Send total_reports reports, batch_size per request, at rate reports per second"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        reports = self.fleet.reports(total_reports)
+        tasks = []
+        requests = -(-total_reports // self.batch_size)
+        started = time.perf_counter()
+        try:
+            for number in range(requests):
+                due = started + number * self.batch_size / self.rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                # Past the concurrency limit the next request waits here, which its latency shows
+                await semaphore.acquire()
+                if time.perf_counter() - due > LATE_START_SECONDS:
+                    self.late_starts += 1
+
+                generate_started = time.perf_counter()
+                batch = [report for _, report in zip(range(self.batch_size), reports)]
+                self.generate_seconds += time.perf_counter() - generate_started
+                tasks.append(asyncio.ensure_future(self.request(batch, due, semaphore)))
+            await asyncio.gather(*tasks)
+        finally:
+            await self.client.aclose()
+        return time.perf_counter() - started
+
+    def results(self, elapsed):
+        requests = sum(self.statuses.values())
+        errors = requests - self.statuses.get("ok", 0)
+        return {
+            "devices": self.fleet.devices,
+            "target_reports_per_second": self.rate,
+            "concurrency": self.concurrency,
+            "batch_size": self.batch_size,
+            "elapsed_seconds": elapsed,
+            "requests": requests,
+            "reports_sent": self.reports_sent,
+            "reports_per_second": self.reports_sent / elapsed if elapsed else 0.0,
+            "requests_per_second": requests / elapsed if elapsed else 0.0,
+            "error_rate": errors / requests if requests else 0.0,
+            "statuses": self.statuses,
+            "bytes_sent": self.bytes_sent,
+            "late_starts": self.late_starts,
+            "generate_seconds": self.generate_seconds,
+            "latency": summarize(self.latency) if self.latency else None,
+            "service_time": summarize(self.service_time) if self.service_time else None,
+            "latency_histogram": self.histogram.to_dict()
+        }
+
+def serve_stub(ready):
+    """Child process target: serve the benchmark's PostgREST stub and report the port"""
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    ready.put(server.server_port)
+    server.serve_forever()
+
+def start_stub_process():
+    """Start the HTTP stub in its own process, so it doesn't share the generator's GIL, and return (process, URL)"""
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve_stub, args=(ready,), daemon=True)
+    process.start()
+    return process, f"http://127.0.0.1:{ready.get(timeout=30)}"
+
+def write_reports(fleet, count, path):
+    """Write count reports as JSON Lines"""
+    with open(path, "w") as f:
+        for report in fleet.reports(count):
+            f.write(json.dumps(report, separators=(",", ":")) + "\n")
+    print(f"Wrote {count} reports from {fleet.devices} devices to {path}")
+
+def parse_args(argv=None):
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description="Replay synthetic fleet reports against a local PostgREST, Supabase or ingest gateway")
+    parser.add_argument("--devices", type=int, default=FLEET_DEVICES, help=f"devices in the fake fleet (default: {FLEET_DEVICES})")
+    parser.add_argument("--seed", type=int, default=0, help="fleet seed; the same seed gives the same device ids and reports (default: 0)")
+    parser.add_argument("--rate", type=float, default=TARGET_RATE, help=f"target reports per second (default: {TARGET_RATE})")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help=f"most requests in flight at once (default: {CONCURRENCY})")
+    parser.add_argument("--duration", type=float, default=DURATION, help=f"seconds to run for at the target rate (default: {DURATION})")
+    parser.add_argument("--reports", type=int, help="send exactly this many reports instead of --duration seconds' worth")
+    parser.add_argument("--batch-size", type=int, default=1, help="reports per request (default: 1, like upload_to_supabase)")
+    parser.add_argument("--url", help="server to send to (default: a built-in HTTP stub)")
+    parser.add_argument("--key", help="API key sent as apikey and bearer token")
+    parser.add_argument("--rest-prefix", default="/rest/v1", help="path of the REST API under --url; \"\" for a bare PostgREST (default: /rest/v1)")
+    parser.add_argument("--gateway", action="store_true", help="--url is ingest_gateway.py: POST reports to /ingest")
+    parser.add_argument("--with-metrics", action="store_true", help="also append device_metrics rows before each upsert, like upload_batch_to_supabase")
+    parser.add_argument("--compression", choices=CONTENT_ENCODINGS, default="identity", help="request body encoding; PostgREST only takes identity, the ingest gateway all of them (default: identity)")
+    parser.add_argument("--zstd-dict", default=ZSTD_DICT_FILE, help=f"trained dictionary for --compression zstd, if it exists (default: {ZSTD_DICT_FILE})")
+    parser.add_argument("--write-reports", metavar="PATH", help="write the reports to PATH as JSON Lines instead of sending them")
+    parser.add_argument("--output", default=RESULTS_FILE, help=f"where to write the JSON results (default: {RESULTS_FILE})")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    fleet = SyntheticFleet(args.devices, args.seed)
+    total_reports = args.reports or max(1, int(args.rate * args.duration))
+
+    if args.write_reports:
+        write_reports(fleet, total_reports, args.write_reports)
+        return
+
+    stub = None
+    url = args.url
+    if url is None:
+        stub, url = start_stub_process()
+    print(f"Sending {total_reports} reports from {args.devices} devices to {url} "
+          f"at {args.rate:g} reports/s, concurrency {args.concurrency}, {args.batch_size} per request...")
+    load_run = LoadRun(fleet, url, args.key, args.rest_prefix, args.gateway, args.with_metrics,
+                       args.rate, args.concurrency, args.batch_size, args.compression,
+                       load_zstd_dictionary(args.zstd_dict) if args.compression == "zstd" else None)
+    try:
+        elapsed = asyncio.run(load_run.run(total_reports))
+    finally:
+        if stub:
+            stub.terminate()
+    results = load_run.results(elapsed)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=4)
+
+    print(f"Sent {results['reports_sent']} reports in {results['requests']} requests over {elapsed:.1f}s: "
+          f"{results['reports_per_second']:.1f} reports/s (target {args.rate:g})")
+    print(f"Errors: {results['error_rate'] * 100:.2f}% {results['statuses']}")
+    if results["latency"]:
+        latency = results["latency"]
+        print(f"Latency from schedule: p50 {latency['p50'] * 1000:.1f} ms, p95 {latency['p95'] * 1000:.1f} ms, "
+              f"p99 {latency['p99'] * 1000:.1f} ms, max {latency['max'] * 1000:.1f} ms")
+        print(load_run.histogram.render())
+    if results["late_starts"]:
+        print(f"{results['late_starts']} requests started more than {LATE_START_SECONDS * 1000:.0f} ms late: "
+              "the generator or the concurrency limit could not keep up with the rate")
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import json
+import random
+import sqlite3
+import time
+
+import agent_stats
+from snapshot import encode_snapshot, decode_snapshot
+
+# Local outbox configuration
+OUTBOX_FILE = "outbox.db"
+OUTBOX_MAX_BYTES = 50 * 1024 * 1024
+OUTBOX_BATCH_SIZE = 50
+
+# Backoff between failed flushes, in seconds
+BACKOFF_BASE = 2
+BACKOFF_MAX = 300
+
+class BatchRejected(ValueError):
+    """Raised by an upload_batch when the server refuses the batch itself, so retrying can't help"""
+
+class Outbox:
+    """Append-only SQLite queue that holds reports until they have been uploaded"""
+
+    def __init__(self, path=OUTBOX_FILE, max_bytes=OUTBOX_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.failures = 0
+        self.next_attempt_at = 0
+
+        self.conn = sqlite3.connect(path)
+        # auto_vacuum only takes effect before the first table is created
+        self.conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+              id INTEGER PRIMARY KEY AUTOINCREMENT,
+              created_at REAL NOT NULL,
+              payload BLOB NOT NULL
+            )
+        """)
+        # Rows that can't be decoded or uploaded are moved here so they don't block the queue
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS outbox_quarantine (
+              id INTEGER PRIMARY KEY,
+              created_at REAL NOT NULL,
+              payload BLOB NOT NULL,
+              error TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+
+        # Track the payload size in memory so put() doesn't have to scan the table
+        row = self.conn.execute("SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM outbox").fetchone()
+        self.total_bytes = row[0]
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def put(self, report, record=None):
+        """Append a report to the outbox, evicting the oldest entries if it grows past max_bytes
+
+        Reports are stored as snapshot records; pass record if the report has
+        already been encoded so it isn't encoded twice.
+        """
+        payload = record if record is not None else encode_snapshot(report)
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO outbox (created_at, payload) VALUES (?, ?)",
+                (time.time(), payload)
+            )
+        self.total_bytes += len(payload)
+
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Delete the oldest entries until the outbox is back under max_bytes"""
+        excess = self.total_bytes - self.max_bytes
+        last_id = None
+        evicted = 0
+        for entry_id, size in self.conn.execute("SELECT id, LENGTH(payload) FROM outbox ORDER BY id"):
+            if excess <= 0:
+                break
+            last_id = entry_id
+            excess -= size
+            self.total_bytes -= size
+            evicted += 1
+
+        if last_id is not None:
+            with self.conn:
+                self.conn.execute("DELETE FROM outbox WHERE id <= ?", (last_id,))
+            self.conn.execute("PRAGMA incremental_vacuum")
+            print(f"Outbox over {self.max_bytes} bytes, evicted {evicted} oldest reports")
+
+    def peek(self, limit):
+        """Return up to limit of the oldest (id, report) pairs without removing them
+
+        Rows that fail to decode (a truncated or corrupt record) are moved to
+        the outbox_quarantine table instead of being returned.
+        """
+        while True:
+            rows = self.conn.execute(
+                "SELECT id, payload FROM outbox ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+            entries = []
+            corrupt = []
+            for entry_id, payload in rows:
+                try:
+                    # Outboxes written before snapshot records hold JSON text
+                    entries.append((entry_id, decode_snapshot(payload)[0] if isinstance(payload, bytes) else json.loads(payload)))
+                except ValueError as e:
+                    corrupt.append((entry_id, e))
+            if corrupt:
+                self.quarantine(corrupt)
+            # A batch that was all corrupt would look like an empty outbox
+            if entries or not corrupt:
+                return entries
+
+    def quarantine(self, corrupt):
+        """Move undecodable or rejected rows, given as (id, error) pairs, out of the queue"""
+        with self.conn:
+            for entry_id, error in corrupt:
+                row = self.conn.execute("SELECT LENGTH(payload) FROM outbox WHERE id = ?", (entry_id,)).fetchone()
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO outbox_quarantine (id, created_at, payload, error) "
+                    "SELECT id, created_at, payload, ? FROM outbox WHERE id = ?",
+                    (str(error), entry_id)
+                )
+                self.conn.execute("DELETE FROM outbox WHERE id = ?", (entry_id,))
+                self.total_bytes -= row[0] if row else 0
+                print(f"Outbox entry {entry_id} moved to outbox_quarantine: {error}")
+        agent_stats.increment("outbox.quarantined", len(corrupt))
+
+    def ack(self, last_id):
+        """Remove every entry up to and including last_id after a successful upload"""
+        with self.conn:
+            row = self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(payload)), 0) FROM outbox WHERE id <= ?", (last_id,)
+            ).fetchone()
+            self.conn.execute("DELETE FROM outbox WHERE id <= ?", (last_id,))
+        self.total_bytes -= row[0]
+
+    def flush(self, upload_batch, batch_size=OUTBOX_BATCH_SIZE, scheduler=None):
+        """Upload queued reports in batches until the outbox is empty or an upload fails
+
+        upload_batch takes a list of reports and returns None on failure, or
+        raises BatchRejected to have the batch moved to outbox_quarantine. After a
+        failure, flush() does nothing until a jittered exponential backoff delay
+        has passed. With a scheduler (an UploadScheduler), it decides instead,
+        and also holds uploads back while the server is slow or rate limiting;
+        the whole flush is one upload cycle, and ready() is checked again
+        between batches.
+        Returns the number of reports uploaded.
+        """
+        if scheduler is not None:
+            if not scheduler.ready():
+                return 0
+            scheduler.start_cycle()
+        elif time.time() < self.next_attempt_at:
+            return 0
+
+        sent = 0
+        while True:
+            entries = self.peek(batch_size)
+            if not entries:
+                break
+
+            if self.failures or (scheduler is not None and scheduler.failures):
+                agent_stats.increment("upload.retries")
+
+            try:
+                result = upload_batch([report for _, report in entries])
+            except BatchRejected as e:
+                self.quarantine([(entry_id, e) for entry_id, _ in entries])
+                continue
+
+            if result is None:
+                if scheduler is not None:
+                    delay = scheduler.failure()
+                else:
+                    # Full jitter keeps a fleet of agents from retrying in lockstep
+                    self.failures += 1
+                    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** self.failures))
+                    self.next_attempt_at = time.time() + delay
+                print(f"Upload failed, {len(self)} reports kept in outbox, retrying in {delay:.0f}s")
+                break
+
+            self.ack(entries[-1][0])
+            self.failures = 0
+            sent += len(entries)
+            if scheduler is not None:
+                scheduler.success()
+                # Backed off or slowed down by this batch's responses: the rest waits
+                if not scheduler.ready():
+                    break
+
+        if scheduler is not None and sent:
+            scheduler.finish_cycle()
+        return sent
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,227 @@
+import gzip
+import json
+import os
+import sys
+import time
+import zlib
+
+import agent_stats
+from snapshot import SNAPSHOT_MAGIC, iter_snapshots
+
+# zstd bindings, imported by import_zstandard() the first time a zstd body or
+# dictionary is handled, so agents that upload gzip never load them
+zstandard = None
+
+# Largest report, as compact JSON, that is uploaded whole; 0 turns trimming off
+REPORT_SIZE_BUDGET = 64 * 1024
+
+# Sections trimmed when a report is over budget, lowest priority first. Lists
+# are cut from the end, and every collector already puts its most important
+# entries first (busiest cgroups and processes, the root disk, GPU 0).
+TRIM_ORDER = ["network_info", "cgroups", "top_processes", "disk_info", "gpu_info"]
+
+# Per-interface detail dropped before any interface is
+NETWORK_DETAIL_FIELDS = ("netmask", "broadcast")
+
+# Request body encodings understood by the ingest gateway
+CONTENT_ENCODINGS = ["identity", "gzip", "zstd"]
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Trained zstd dictionary shared by agents and the gateway
+ZSTD_DICT_FILE = "zstd_dict.bin"
+ZSTD_DICT_SIZE = 16 * 1024
+
+# A compressed body may not expand past this, so a tiny request can't exhaust memory
+MAX_DECODED_BYTES = 16 * 1024 * 1024
+
+def import_zstandard():
+    """Import zstandard on first use; returns None if it isn't installed"""
+    global zstandard
+    if zstandard is None:
+        try:
+            import zstandard as module
+        except ImportError:
+            return None
+        zstandard = module
+    return zstandard
+
+def payload_size(data):
+    """Size in bytes of data once encoded as compact JSON"""
+    return len(json.dumps(data, separators=(",", ":")))
+
+def trim_marker(dropped, budget):
+    return {"error": f"{dropped} entries trimmed to fit the {budget / 1024:g} KiB report budget"}
+
+def trim_report(report, budget=REPORT_SIZE_BUDGET):
+    """Return report cut down to budget bytes of compact JSON, and the names of the sections trimmed
+
+    The report itself is left alone; a trimmed copy is returned. Timings are
+    dropped from _agent_stats first, then per-interface detail, then entries
+    of each TRIM_ORDER section in turn, each cut list ending in an
+    {"error": ...} marker like a timed-out collector's. A report that still
+    doesn't fit once every section is trimmed is returned as small as it got.
+    """
+    size = payload_size(report)
+    if not budget or size <= budget:
+        return report, []
+
+    report = dict(report)
+    trimmed = []
+
+    stats = report.get("_agent_stats")
+    if isinstance(stats, dict) and stats.get("spans"):
+        report["_agent_stats"] = {"counters": stats.get("counters", {}), "error": "spans trimmed to fit the report budget"}
+        trimmed.append("_agent_stats")
+        size = payload_size(report)
+
+    interfaces = report.get("network_info")
+    if size > budget and isinstance(interfaces, list):
+        report["network_info"] = [
+            {key: value for key, value in interface.items() if key not in NETWORK_DETAIL_FIELDS}
+            for interface in interfaces
+            if not (isinstance(interface, dict) and "error" in interface)
+        ] + [{"error": f"{', '.join(NETWORK_DETAIL_FIELDS)} trimmed to fit the {budget / 1024:g} KiB report budget"}]
+        trimmed.append("network_info")
+        size = payload_size(report)
+
+    for section in TRIM_ORDER:
+        if size <= budget:
+            break
+        entries = report.get(section)
+        if not isinstance(entries, list) or not entries:
+            continue
+
+        # Earlier markers are folded into the new one
+        kept = [entry for entry in entries if not (isinstance(entry, dict) and "error" in entry)]
+        # A compact JSON list is "[" + entries joined by "," + "]", so its size
+        # for any prefix follows from the entry sizes
+        sizes = [payload_size(entry) for entry in kept]
+        without = size - payload_size(entries)
+        count = len(kept)
+        while count > 0:
+            marker = payload_size(trim_marker(len(kept) - count, budget)) + 1
+            if without + 2 + sum(sizes[:count]) + count - 1 + marker <= budget:
+                break
+            count -= 1
+
+        report[section] = kept[:count] + [trim_marker(len(kept) - count, budget)]
+        if section not in trimmed:
+            trimmed.append(section)
+        size = payload_size(report)
+
+    agent_stats.increment("upload.reports_trimmed")
+    return report, trimmed
+
+def load_zstd_dictionary(path=ZSTD_DICT_FILE):
+    """Return the trained dictionary at path, or None if there isn't one or zstandard is missing"""
+    if not path or not os.path.exists(path) or import_zstandard() is None:
+        return None
+    with open(path, "rb") as f:
+        dictionary = zstandard.ZstdCompressionDict(f.read())
+    # Done once here instead of by every compressor that uses it
+    dictionary.precompute_compress(level=ZSTD_LEVEL)
+    return dictionary
+
+def encode_body(body, encoding, dictionary=None):
+    """Compress a request body, counting bytes in and out and the time taken in agent_stats"""
+    if encoding == "identity":
+        return body
+    with agent_stats.span(f"compress.{encoding}"):
+        if encoding == "gzip":
+            # mtime=0 so the same body always compresses to the same bytes
+            encoded = gzip.compress(body, GZIP_LEVEL, mtime=0)
+        elif encoding == "zstd":
+            if import_zstandard() is None:
+                raise RuntimeError("zstd compression needs zstandard: pip install zstandard")
+            encoded = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary).compress(body)
+        else:
+            raise ValueError(f"unknown content encoding {encoding}")
+    agent_stats.increment(f"compress.{encoding}.input_bytes", len(body))
+    agent_stats.increment(f"compress.{encoding}.output_bytes", len(encoded))
+    return encoded
+
+def decode_body(body, encoding, dictionary=None, max_size=MAX_DECODED_BYTES):
+    """Decompress a request body, raising ValueError if it is corrupt or expands past max_size"""
+    if encoding in ("", "identity"):
+        return body
+    if encoding == "gzip":
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            decoded = decompressor.decompress(body, max_size)
+        except zlib.error as e:
+            raise ValueError(f"invalid gzip body: {e}")
+        if decompressor.unconsumed_tail:
+            raise ValueError(f"body expands past {max_size} bytes")
+        return decoded
+    if encoding == "zstd" and import_zstandard() is not None:
+        try:
+            # decompress() trusts the size in the frame header, so check it first;
+            # max_output_size only applies to frames without one
+            if zstandard.frame_content_size(body) > max_size:
+                raise ValueError(f"body expands past {max_size} bytes")
+            return zstandard.ZstdDecompressor(dict_data=dictionary).decompress(body, max_output_size=max_size)
+        except zstandard.ZstdError as e:
+            raise ValueError(f"invalid zstd body: {e}")
+    raise ValueError(f"unsupported content encoding {encoding}")
+
+def iter_sample_bodies(paths):
+    """Yield compact JSON bodies of the reports in JSON Lines and snapshot files"""
+    for path in paths:
+        with open(path, "rb") as f:
+            data = f.read()
+        if data.startswith(SNAPSHOT_MAGIC):
+            reports = iter_snapshots(data)
+        else:
+            reports = (json.loads(line) for line in data.splitlines() if line.strip())
+        for report in reports:
+            yield json.dumps(report, separators=(",", ":")).encode()
+
+def train_dictionary(paths, output=ZSTD_DICT_FILE, size=ZSTD_DICT_SIZE):
+    """Train a zstd dictionary on the reports in paths and write it to output"""
+    samples = list(iter_sample_bodies(paths))
+    dictionary = zstandard.train_dictionary(size, samples)
+    tmp_file = output + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(dictionary.as_bytes())
+    os.replace(tmp_file, output)
+    print(f"Trained a {len(dictionary.as_bytes())} byte dictionary (id {dictionary.dict_id()}) on {len(samples)} reports, written to {output}")
+
+def compare_encodings(paths, dictionary=None):
+    """Print the average size and time of each encoding, one report at a time"""
+    samples = list(iter_sample_bodies(paths))
+    encodings = [("identity", None), ("gzip", None)]
+    if import_zstandard() is not None:
+        encodings.append(("zstd", None))
+        if dictionary is not None:
+            encodings.append(("zstd", dictionary))
+
+    raw = sum(len(body) for body in samples)
+    print(f"{len(samples)} reports, {raw / len(samples):.0f} bytes each on average")
+    for encoding, encoding_dictionary in encodings:
+        started = time.perf_counter()
+        encoded = sum(len(encode_body(body, encoding, encoding_dictionary)) for body in samples)
+        elapsed = time.perf_counter() - started
+        label = encoding + (" + dictionary" if encoding_dictionary is not None else "")
+        print(f"{label:18} {encoded / len(samples):9.0f} bytes  ratio {raw / encoded:6.2f}  {elapsed / len(samples) * 1e6:8.1f} us/report")
+
+if __name__ == "__main__":
+    # python payload.py train <reports.jsonl|snapshots.bin>... [--output zstd_dict.bin]
+    # python payload.py compare <reports.jsonl|snapshots.bin>... [--dict zstd_dict.bin]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Train a zstd dictionary for report uploads, or compare body encodings")
+    parser.add_argument("command", choices=["train", "compare"])
+    parser.add_argument("paths", nargs="+", help="JSON Lines files of reports (load_generator.py --write-reports) or snapshot logs (snapshots.bin)")
+    parser.add_argument("--output", default=ZSTD_DICT_FILE, help=f"where train writes the dictionary (default: {ZSTD_DICT_FILE})")
+    parser.add_argument("--size", type=int, default=ZSTD_DICT_SIZE, help=f"dictionary size in bytes (default: {ZSTD_DICT_SIZE})")
+    parser.add_argument("--dict", default=ZSTD_DICT_FILE, help=f"dictionary compare also tries (default: {ZSTD_DICT_FILE})")
+    args = parser.parse_args()
+
+    if args.command == "train":
+        if import_zstandard() is None:
+            print("Training a dictionary needs zstandard: pip install zstandard")
+            sys.exit(1)
+        train_dictionary(args.paths, args.output, args.size)
+    else:
+        compare_encodings(args.paths, load_zstd_dictionary(args.dict))
@@ -0,0 +1,152 @@
+import bisect
+import os
+import sys
+import threading
+import time
+
+import psutil
+
+# Number of processes reported in each of the CPU and memory rankings
+TOP_PROCESSES = 10
+
+# Stop scanning the process table after this long and report what was seen
+PROCESS_SCAN_BUDGET = 0.5
+
+# Attributes fetched through psutil where /proc can't be read directly
+PROCESS_ATTRS = ["name", "cpu_times", "memory_info", "create_time"]
+
+# Linux fast path: everything the ranking needs is in /proc/<pid>/stat, one
+# read per process where psutil needs two and a naive scan three
+PROC_DIR = "/proc"
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def parse_proc_stat(data):
+    """(name, state, CPU ticks, start ticks after boot, RSS pages) from the contents of /proc/<pid>/stat"""
+    # The name is in parentheses and may itself contain spaces and parentheses
+    start = data.find(b"(")
+    end = data.rfind(b")")
+    fields = data[end + 2:].split()
+    # state ppid ... utime(11) stime(12) ... starttime(19) vsize(20) rss(21)
+    return data[start + 1:end].decode(errors="replace"), fields[0], int(fields[11]) + int(fields[12]), int(fields[19]), int(fields[21])
+
+class ProcessSampler:
+    """Ranks processes by CPU and memory use without a blocking cpu_percent(interval)
+
+    CPU usage is the CPU time each process used since it was last sampled,
+    divided by the wall time in between. Counters are cached per PID together
+    with the create time, so a reused PID is treated as a new process, and
+    dropped once the PID is gone. On the first sample of a process its
+    lifetime average is used instead. A scan that runs out of budget resumes
+    at the next PID on the following sample, so every process is seen in turn.
+    """
+
+    def __init__(self, top_n=TOP_PROCESSES, budget=PROCESS_SCAN_BUDGET, use_procfs=True):
+        self.top_n = top_n
+        self.budget = budget
+        self.use_procfs = use_procfs and sys.platform.startswith("linux") and os.path.isdir(PROC_DIR)
+        self.boot_time = psutil.boot_time() if self.use_procfs else None
+        # pid -> (create time, CPU seconds, when they were read)
+        self.cpu_times = {}
+        # Process objects reused between samples, as process_iter() does, on the psutil path
+        self.processes = {}
+        # Where the last truncated scan stopped
+        self.resume_pid = 0
+        # A timed-out collector may still be sampling when the next one starts
+        self.lock = threading.Lock()
+
+    def sample(self):
+        """Return the top processes by CPU and by memory as a list of dicts"""
+        with self.lock:
+            return self._sample()
+
+    def read_process(self, pid):
+        """(name, CPU seconds, create time, RSS bytes) of a process, or None if it is gone or not ours to look at"""
+        if self.use_procfs:
+            try:
+                fd = os.open(f"{PROC_DIR}/{pid}/stat", os.O_RDONLY)
+                try:
+                    data = os.read(fd, 4096)
+                finally:
+                    os.close(fd)
+            except OSError:
+                return None
+            name, state, cpu_ticks, start_ticks, rss_pages = parse_proc_stat(data)
+            if state == b"Z":
+                return None
+            return name, cpu_ticks / CLOCK_TICKS, self.boot_time + start_ticks / CLOCK_TICKS, rss_pages * PAGE_SIZE
+
+        process = self.processes.get(pid)
+        try:
+            if process is None:
+                process = self.processes[pid] = psutil.Process(pid)
+            # as_dict() fetches the attributes inside oneshot()
+            info = process.as_dict(PROCESS_ATTRS, ad_value=None)
+        except psutil.NoSuchProcess:
+            self.processes.pop(pid, None)
+            return None
+        if info["cpu_times"] is None or info["memory_info"] is None:
+            return None
+        return info["name"], info["cpu_times"].user + info["cpu_times"].system, info["create_time"], info["memory_info"].rss
+
+    def _sample(self):
+        started = time.perf_counter()
+        memory_total = psutil.virtual_memory().total
+
+        pids = psutil.pids()
+        live = set(pids)
+        for pid in [pid for pid in self.processes if pid not in live]:
+            del self.processes[pid]
+        # Only running processes are kept, so the cache can't grow without bound
+        cpu_times = {pid: entry for pid, entry in self.cpu_times.items() if pid in live}
+
+        processes = []
+        truncated = False
+        first = bisect.bisect_left(pids, self.resume_pid)
+        for pid in pids[first:] + pids[:first]:
+            if time.perf_counter() - started > self.budget:
+                truncated = True
+                self.resume_pid = pid
+                break
+
+            entry = self.read_process(pid)
+            if entry is None:
+                continue
+            name, cpu_time, create_time, rss = entry
+            now = time.time()
+
+            previous = cpu_times.get(pid)
+            if previous is not None and previous[0] == create_time and previous[1] <= cpu_time and now > previous[2]:
+                cpu_percent = (cpu_time - previous[1]) / (now - previous[2]) * 100
+            elif previous is not None and previous[0] == create_time:
+                # psutil caches create_time, so a reused PID can only show as CPU time going backwards
+                self.processes.pop(pid, None)
+                cpu_percent = 0.0
+            else:
+                lifetime = now - create_time if create_time else 0
+                cpu_percent = cpu_time / lifetime * 100 if lifetime > 0 else 0.0
+            cpu_times[pid] = (create_time, cpu_time, now)
+
+            processes.append((cpu_percent, rss, pid, name))
+
+        if not truncated:
+            self.resume_pid = 0
+        self.cpu_times = cpu_times
+
+        by_cpu = sorted(processes, reverse=True)[:self.top_n]
+        by_memory = sorted(processes, key=lambda entry: entry[1], reverse=True)[:self.top_n]
+        top = sorted(set(by_cpu) | set(by_memory), reverse=True)
+
+        top_processes = [
+            {
+                "pid": pid,
+                "name": name,
+                "cpu_percent": round(cpu_percent, 1),
+                "memory_rss": rss,
+                "memory_percent": round(rss / memory_total * 100, 2)
+            }
+            for cpu_percent, rss, pid, name in top
+        ]
+        if truncated:
+            top_processes.append({"error": f"process scan stopped after {self.budget}s, {len(processes)} processes seen, resuming at PID {self.resume_pid}"})
+        return top_processes
@@ -0,0 +1,206 @@
+import os
+import sys
+import threading
+from array import array
+
+# Linux-only fast path for the metrics sampled every second. psutil opens,
+# reads and splits the whole file and builds namedtuples on every call; here
+# each file is opened once and re-read with one pread into a buffer that is
+# kept between samples, and only the fields the agent reports are parsed.
+MEMINFO_FILE = "/proc/meminfo"
+STAT_FILE = "/proc/stat"
+DISKSTATS_FILE = "/proc/diskstats"
+NET_DEV_FILE = "/proc/net/dev"
+CPUINFO_FILE = "/proc/cpuinfo"
+CPUFREQ_DIR = "/sys/devices/system/cpu/cpufreq"
+CPU_DIR = "/sys/devices/system/cpu"
+SYS_BLOCK_DIR = "/sys/block"
+
+# diskstats counts 512-byte sectors whatever the device's real sector size
+SECTOR_SIZE = 512
+
+class ProcFile:
+    """A procfs or sysfs file kept open and re-read from the start into a reused buffer"""
+
+    def __init__(self, path, size=4096):
+        self.path = path
+        self.fd = os.open(path, os.O_RDONLY)
+        self.buffer = bytearray(size)
+        self.length = 0
+
+    def read(self):
+        """Re-read the whole file; the contents are self.buffer[:self.length]"""
+        while True:
+            length = os.preadv(self.fd, [self.buffer], 0)
+            if length < len(self.buffer):
+                self.length = length
+                return self.buffer
+            # Didn't fit: grow, and keep the bigger buffer for later samples
+            self.buffer = bytearray(len(self.buffer) * 2)
+
+    def close(self):
+        os.close(self.fd)
+
+def meminfo_field(buffer, length, name):
+    """Value in bytes of a /proc/meminfo field such as b"MemTotal:", or None if it is missing"""
+    start = buffer.find(name, 0, length)
+    if start < 0:
+        return None
+    start += len(name)
+    end = buffer.find(b"kB", start, length)
+    # int() skips the padding around the number
+    return int(buffer[start:end]) * 1024
+
+def find_cpufreq_files():
+    """scaling_cur_freq of every cpufreq policy, or of every CPU on older kernels"""
+    if os.path.isdir(CPUFREQ_DIR):
+        names = [name for name in os.listdir(CPUFREQ_DIR) if name.startswith("policy") and name[6:].isdigit()]
+        paths = [os.path.join(CPUFREQ_DIR, name, "scaling_cur_freq") for name in sorted(names, key=lambda name: int(name[6:]))]
+    else:
+        names = [name for name in os.listdir(CPU_DIR) if name.startswith("cpu") and name[3:].isdigit()]
+        paths = [os.path.join(CPU_DIR, name, "cpufreq", "scaling_cur_freq") for name in sorted(names, key=lambda name: int(name[3:]))]
+    return [path for path in paths if os.path.exists(path)]
+
+class ProcfsReader:
+    """Memory, CPU, frequency, disk and network counters from files kept open
+
+    Each method returns the same numbers as its psutil counterpart:
+    memory() like virtual_memory(), cpu_percent() like cpu_percent(None) and
+    cpu_percent(None, percpu=True), cpu_frequency() like cpu_freq().current,
+    disk_io() like disk_io_counters() and net_io() like net_io_counters().
+    """
+
+    def __init__(self):
+        self.meminfo = ProcFile(MEMINFO_FILE)
+        self.stat = ProcFile(STAT_FILE, 8192)
+        self.diskstats = ProcFile(DISKSTATS_FILE, 8192)
+        self.net_dev = ProcFile(NET_DEV_FILE, 8192)
+        self.cpufreq = [ProcFile(path, 64) for path in find_cpufreq_files()]
+        # Without cpufreq (most VMs) the frequency is only in /proc/cpuinfo
+        self.cpuinfo = None if self.cpufreq else ProcFile(CPUINFO_FILE, 16384)
+        # Whole disks, as psutil counts them: anything with an entry in /sys/block
+        self.disks = {name.replace("!", "/").encode() for name in os.listdir(SYS_BLOCK_DIR)}
+
+        # Busy and total jiffies of the aggregate "cpu" line and of each CPU,
+        # now and at the previous cpu_percent() call
+        slots = (os.cpu_count() or 1) + 1
+        self.busy = array("d", bytes(8 * slots))
+        self.total = array("d", bytes(8 * slots))
+        self.previous_busy = array("d", bytes(8 * slots))
+        self.previous_total = array("d", bytes(8 * slots))
+        self.cpu_lines = 0
+        self.lock = threading.Lock()
+
+    def close(self):
+        for proc_file in [self.meminfo, self.stat, self.diskstats, self.net_dev, self.cpuinfo, *self.cpufreq]:
+            if proc_file is not None:
+                proc_file.close()
+
+    def memory(self):
+        """(total, available, percent used) in bytes, or None on kernels without MemAvailable"""
+        with self.lock:
+            buffer = self.meminfo.read()
+            length = self.meminfo.length
+            total = meminfo_field(buffer, length, b"MemTotal:")
+            available = meminfo_field(buffer, length, b"MemAvailable:")
+        if not total or available is None:
+            return None
+        return total, available, round((total - available) / total * 100, 1)
+
+    def read_cpu_times(self):
+        """Fill self.busy and self.total from the cpu lines of /proc/stat"""
+        buffer = self.stat.read()
+        length = self.stat.length
+        position = 0
+        line = 0
+        while buffer.startswith(b"cpu", position):
+            end = buffer.find(b"\n", position, length)
+            fields = buffer[position:end].split()
+            # user nice system idle iowait irq softirq steal guest guest_nice;
+            # guest time is already counted in user and nice
+            values = [int(field) for field in fields[1:11]]
+            total = sum(values) - sum(values[8:10])
+            if line == len(self.total):
+                # More CPUs online than when we started
+                for times in (self.busy, self.total, self.previous_busy, self.previous_total):
+                    times.append(0.0)
+            self.total[line] = total
+            self.busy[line] = total - values[3] - (values[4] if len(values) > 4 else 0)
+            line += 1
+            position = end + 1
+        self.cpu_lines = line
+
+    def cpu_percent(self):
+        """(all CPUs, busiest single CPU) percent since the previous call; (0.0, 0.0) the first time"""
+        with self.lock:
+            self.read_cpu_times()
+            overall = 0.0
+            busiest = 0.0
+            for line in range(self.cpu_lines):
+                elapsed = self.total[line] - self.previous_total[line]
+                if elapsed > 0 and self.previous_total[line]:
+                    percent = min(100.0, max(0.0, round((self.busy[line] - self.previous_busy[line]) / elapsed * 100, 1)))
+                    if line == 0:
+                        overall = percent
+                    elif percent > busiest:
+                        busiest = percent
+                self.previous_busy[line] = self.busy[line]
+                self.previous_total[line] = self.total[line]
+            return overall, busiest
+
+    def cpu_frequency(self):
+        """Mean current frequency in MHz, or None if the kernel doesn't expose one"""
+        with self.lock:
+            if self.cpufreq:
+                # kHz, one number per file
+                frequencies = [int(proc_file.read()[:proc_file.length]) for proc_file in self.cpufreq]
+                return sum(frequencies) / len(frequencies) / 1000
+            buffer = self.cpuinfo.read()
+            length = self.cpuinfo.length
+            total = 0.0
+            count = 0
+            position = buffer.find(b"cpu MHz", 0, length)
+            while position >= 0:
+                start = buffer.find(b":", position, length) + 1
+                end = buffer.find(b"\n", start, length)
+                total += float(buffer[start:end])
+                count += 1
+                position = buffer.find(b"cpu MHz", end, length)
+            return total / count if count else None
+
+    def disk_io(self):
+        """(busy milliseconds, bytes read, bytes written) summed over whole disks"""
+        with self.lock:
+            buffer = self.diskstats.read()
+            busy_time = read_bytes = write_bytes = 0
+            for line in buffer[:self.diskstats.length].splitlines():
+                fields = line.split()
+                # major minor name reads merged sectors ms writes merged sectors ms in-flight io_ticks ...
+                if len(fields) >= 14 and bytes(fields[2]) in self.disks:
+                    read_bytes += int(fields[5])
+                    write_bytes += int(fields[9])
+                    busy_time += int(fields[12])
+        return busy_time, read_bytes * SECTOR_SIZE, write_bytes * SECTOR_SIZE
+
+    def net_io(self):
+        """(bytes received, bytes sent) summed over every interface"""
+        with self.lock:
+            buffer = self.net_dev.read()
+            received = sent = 0
+            # Two header lines, then "  name: rx_bytes packets ... (8 fields) tx_bytes ..."
+            for line in buffer[:self.net_dev.length].splitlines()[2:]:
+                fields = line[line.find(b":") + 1:].split()
+                if len(fields) >= 9:
+                    received += int(fields[0])
+                    sent += int(fields[8])
+        return received, sent
+
+def open_procfs_reader():
+    """Return a ProcfsReader, or None off Linux or where the files can't be opened, for callers to fall back to psutil"""
+    if not sys.platform.startswith("linux") or not hasattr(os, "preadv"):
+        return None
+    try:
+        return ProcfsReader()
+    except (OSError, ValueError) as e:
+        print(f"Falling back to psutil for metric sampling: {e}")
+        return None
@@ -0,0 +1,173 @@
+import threading
+import tkinter as tk
+from tkinter import ttk
+from PIL import Image, ImageTk, ImageDraw, ImageFilter
+import win32event
+import win32api
+import winerror
+import sys
+from collector import iter_system_info, save_system_info, upload_to_supabase
+
+# Global flag to prevent multiple instances
+already_running = False
+
+class AppGUI:
+
+    def __init__(self, root):
+        self.root = root
+        self.root.title("Device Specs Collector")
+        
+        # Set window size and position it in center of screen
+        window_width = 500
+        window_height = 350
+        screen_width = self.root.winfo_screenwidth()
+        screen_height = self.root.winfo_screenheight()
+        center_x = int(screen_width/2 - window_width/2)
+        center_y = int(screen_height/2 - window_height/2)
+        self.root.geometry(f'{window_width}x{window_height}+{center_x}+{center_y}')
+        
+        # Prevent resizing
+        self.root.resizable(False, False)
+        
+        # Configure window theme
+        self.root.configure(bg="#f0f2f5")
+        
+        # Create a main frame
+        self.main_frame = tk.Frame(self.root, bg="#f0f2f5")
+        self.main_frame.pack(fill="both", expand=True, padx=20, pady=20)
+        
+        # Create header label
+        self.header_label = tk.Label(
+            self.main_frame, 
+            text="Fetching Device Specs", 
+            font=("Segoe UI", 24, "bold"),
+            fg="#1a73e8",
+            bg="#f0f2f5"
+        )
+        self.header_label.pack(pady=(20, 30))
+        
+        # Create status frame with rounded corners (visual effect)
+        self.status_frame_outer = tk.Frame(self.main_frame, bg="#f0f2f5")
+        self.status_frame_outer.pack(fill="x", padx=20, pady=20)
+        
+        # Status message
+        self.status_message = tk.StringVar()
+        self.status_message.set("Initializing...")
+        self.status_label = tk.Label(
+            self.status_frame_outer,
+            textvariable=self.status_message,
+            font=("Segoe UI", 14),
+            fg="#202124",
+            bg="#f0f2f5",
+            justify="center"
+        )
+        self.status_label.pack(pady=10)
+        
+        # Progress bar
+        self.progress = ttk.Progressbar(
+            self.status_frame_outer, 
+            orient="horizontal", 
+            length=400, 
+            mode="determinate"
+        )
+        self.progress.pack(pady=10)
+        
+        # Exit button (hidden initially)
+        self.exit_button = tk.Button(
+            self.main_frame,
+            text="Exit",
+            font=("Segoe UI", 12, "bold"),
+            bg="#1a73e8",
+            fg="white",
+            relief="flat",
+            command=self.exit_app,
+            padx=20,
+            pady=5
+        )
+        
+        # Configure the button to have rounded corners using event binding
+        self.exit_button.bind("<Enter>", lambda e: self.exit_button.config(bg="#1967d2"))
+        self.exit_button.bind("<Leave>", lambda e: self.exit_button.config(bg="#1a73e8"))
+        
+        # Style for ttk widgets
+        self.style = ttk.Style()
+        self.style.configure("TProgressbar", thickness=10, background="#1a73e8")
+        
+        # Start the processing thread
+        self.processing_thread = threading.Thread(target=self.process_and_upload)
+        self.processing_thread.daemon = True
+        self.processing_thread.start()
+    
+    def process_and_upload(self):
+        # Update status
+        self.update_status("Gathering system information...", 5)
+        
+        # Get system info, showing each collector as it finishes
+        try:
+            system_info = {}
+            for _, label, system_info, completed, total in iter_system_info():
+                self.update_status(f"Collected {label} ({completed}/{total})", 5 + 60 * completed // total)
+            
+            # Save to file
+            save_system_info(system_info)
+            self.update_status("Uploading to database...", 75)
+            
+            # Upload to Supabase
+            upload_result = upload_to_supabase(system_info)
+            
+            # Check upload result
+            if upload_result:
+                self.update_status("All Done", 100)
+                # Show exit button
+                self.root.after(0, lambda: self.exit_button.pack(pady=20))
+                # Start countdown
+                self.start_exit_countdown()
+            else:
+                self.update_status("Error uploading data", 100)
+                self.root.after(0, lambda: self.exit_button.pack(pady=20))
+                
+        except Exception as e:
+            self.update_status(f"Error: {str(e)[:50]}...", 100)
+            self.root.after(0, lambda: self.exit_button.pack(pady=20))
+    
+    def update_status(self, message, progress_value):
+        # This method safely updates the UI from a non-main thread
+        self.root.after(0, lambda: self.status_message.set(message))
+        self.root.after(0, lambda: self.progress.config(value=progress_value))
+    
+    def start_exit_countdown(self):
+        # Start a countdown before exit
+        self.countdown_value = 3
+        self.countdown()
+    
+    def countdown(self):
+        if self.countdown_value > 0:
+            self.exit_button.config(text=f"Exiting in {self.countdown_value}...")
+            self.countdown_value -= 1
+            self.root.after(1000, self.countdown)
+        else:
+            self.exit_app()
+    
+    def exit_app(self):
+        self.root.destroy()
+
+def main():
+    global already_running
+    
+    # Prevent multiple instances
+    if already_running:
+        return
+    
+    already_running = True
+    
+    # Create and run the application
+    mutex = win32event.CreateMutex(None, 1, 'DeviceSpecsCollector')
+    if win32api.GetLastError() == winerror.ERROR_ALREADY_EXISTS:
+        print("Application already running")
+        sys.exit(0)
+    root = tk.Tk()
+    app = AppGUI(root)
+    root.mainloop()
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
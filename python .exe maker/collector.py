@@ -0,0 +1,92 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+
+# Collection and upload logic for the desktop app. Nothing here imports
+# tkinter or win32, so it can be imported and run headless on any OS.
+# The collectors and the upload are the agent's own (main.py in the folder
+# above), so the app and the agent report the same fields the same way;
+# importing the agent has no side effects.
+AGENT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if AGENT_DIR not in sys.path:
+    sys.path.append(AGENT_DIR)
+import main as agent
+
+# Seconds to wait for all collectors before giving up on the slow ones
+COLLECT_TIMEOUT = 15
+
+# (name, label shown while collecting, function); the order here is the key order of the report
+COLLECTORS = [
+    ("device_id", "device ID", agent.collect_device_id),
+    ("basic", "system details", agent.collect_basic_info),
+    ("cpu", "CPU information", agent.collect_cpu_info),
+    ("memory", "memory information", agent.collect_memory_info),
+    ("disk", "disk information", agent.collect_disk_info),
+    ("gpu", "GPU information", agent.collect_gpu_info),
+    ("network", "network information", agent.collect_network_info),
+]
+
+def _run_collector(name, collector, results):
+    """Thread target that posts the collector's result, or an empty one if it failed"""
+    result = {}
+    try:
+        collector(result)
+    except Exception as e:
+        print(f"Error in {name} collector: {e}")
+        result = {}
+    results.put((name, result))
+
+def iter_system_info(timeout=COLLECT_TIMEOUT):
+    """Run the collectors concurrently, yielding (name, label, system_info, completed, total) as each finishes
+
+    system_info holds everything collected so far, in report order. Collectors
+    still running after timeout seconds are skipped.
+    """
+    results = queue.Queue()
+    for name, _, collector in COLLECTORS:
+        threading.Thread(target=_run_collector, args=(name, collector, results), daemon=True).start()
+
+    labels = {name: label for name, label, _ in COLLECTORS}
+    finished = {}
+    deadline = time.monotonic() + timeout
+    total = len(COLLECTORS)
+    while len(finished) < total:
+        try:
+            name, result = results.get(timeout=max(0, deadline - time.monotonic()))
+        except queue.Empty:
+            print("Some collectors timed out, using partial results")
+            break
+        finished[name] = result
+
+        system_info = {}
+        for collector_name, _, _ in COLLECTORS:
+            system_info.update(finished.get(collector_name, {}))
+        system_info["timestamp"] = int(time.time())
+        yield name, labels[name], system_info, len(finished), total
+
+def get_system_info():
+    """Collect system specifications and return as a dictionary"""
+    system_info = {}
+    for _, _, system_info, _, _ in iter_system_info():
+        pass
+    return system_info
+
+def save_system_info(system_info, path="system_info.json"):
+    """Save system information to a local file"""
+    with open(path, "w") as f:
+        json.dump(system_info, f, indent=4)
+
+def upload_to_supabase(system_info):
+    """Upload system information to Supabase, updating existing record if it exists"""
+    return agent.upload_to_supabase(system_info)
+
+if __name__ == "__main__":
+    # Headless run: print progress, save and upload
+    system_info = {}
+    for _, label, system_info, completed, total in iter_system_info():
+        print(f"[{completed}/{total}] Collected {label}")
+    save_system_info(system_info)
+    print("Uploaded" if upload_to_supabase(system_info) else "Upload failed")
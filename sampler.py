@@ -0,0 +1,212 @@
+import math
+import os
+import threading
+import time
+from array import array
+
+import psutil
+
+from disks import DiskUsageReader, STATVFS_TIMEOUT
+from procfs import open_procfs_reader
+
+# Seconds between high-frequency samples
+SAMPLE_INTERVAL = 1.0
+
+# Metrics kept at full resolution between uploads
+SAMPLED_METRICS = (
+    "cpu_percent", "cpu_max_core_percent", "memory_percent_used", "memory_available",
+    "disk_percent_used", "disk_busy_percent", "network_recv_bytes_per_sec", "network_sent_bytes_per_sec"
+)
+
+class RingBuffer:
+    """Fixed-size buffer of floats; once full, each append overwrites the oldest value"""
+
+    def __init__(self, capacity):
+        self.values = array("d", bytes(8 * capacity))
+        self.capacity = capacity
+        self.next = 0
+        self.count = 0
+
+    def append(self, value):
+        self.values[self.next] = value
+        self.next = (self.next + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def clear(self):
+        self.next = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def sorted_values(self):
+        """The stored values in ascending order"""
+        if self.count < self.capacity:
+            return sorted(self.values[:self.count])
+        return sorted(self.values)
+
+def summarize_buffer(buffer):
+    """Reduce a ring buffer to min, max, mean and nearest-rank percentiles"""
+    ordered = buffer.sorted_values()
+    count = len(ordered)
+
+    def percentile(p):
+        return ordered[max(0, min(count - 1, math.ceil(p / 100 * count) - 1))]
+
+    return {
+        "min": ordered[0],
+        "max": ordered[-1],
+        "mean": math.fsum(ordered) / count,
+        "p50": percentile(50),
+        "p95": percentile(95),
+        "p99": percentile(99)
+    }
+
+def rate(value, last_value, elapsed):
+    """Per-second rate between two counter readings, or None if the counter went backwards (wrapped or reset)"""
+    if last_value is None or elapsed <= 0 or value < last_value:
+        return None
+    return (value - last_value) / elapsed
+
+class HighFrequencySampler:
+    """Samples CPU, memory, disk and network utilization every interval seconds in a background thread
+
+    Samples go into one preallocated RingBuffer per metric, so memory use is
+    fixed however long the agent runs. aggregate() reduces the current window
+    to min/max/mean/p50/p95/p99 and starts a new one; only those aggregates
+    are uploaded. A window longer than capacity samples keeps the newest ones.
+    On Linux the counters are read through a ProcfsReader, which keeps the
+    /proc files open between samples; elsewhere, or with use_procfs=False,
+    through psutil. Disk usage goes through a DiskUsageReader, so a hung
+    mount is skipped instead of stalling the sampler thread.
+    """
+
+    def __init__(self, capacity, interval=SAMPLE_INTERVAL, mountpoints=None, use_procfs=True):
+        self.interval = interval
+        self.mountpoints = list(mountpoints or [os.path.abspath(os.sep)])
+        # Only the mountpoint matters for the percentages; a hung mount must not eat the whole interval
+        self.partitions = [{"device": None, "mountpoint": mountpoint, "file_system_type": None} for mountpoint in self.mountpoints]
+        self.disk_reader = DiskUsageReader(timeout=min(STATVFS_TIMEOUT, interval / 2))
+        self.buffers = {name: RingBuffer(capacity) for name in SAMPLED_METRICS}
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.window_start = time.time()
+        # Counter readings at the previous sample, for rates
+        self.last_sample_at = None
+        self.last_busy_time = None
+        self.last_recv_bytes = None
+        self.last_sent_bytes = None
+
+        # The first cpu_percent() call only sets the baseline
+        self.procfs = open_procfs_reader() if use_procfs else None
+        if self.procfs:
+            self.procfs.cpu_percent()
+        else:
+            psutil.cpu_percent(None)
+            psutil.cpu_percent(None, percpu=True)
+
+    def read_counters(self):
+        """(cpu percent, busiest core percent, memory percent, memory available, disk busy ms, bytes received, bytes sent)"""
+        if self.procfs:
+            cpu_percent, cpu_max_core_percent = self.procfs.cpu_percent()
+            memory = self.procfs.memory()
+            if memory is None:
+                memory = psutil.virtual_memory()
+            _, memory_available, memory_percent = memory[:3]
+            busy_time = self.procfs.disk_io()[0]
+            recv_bytes, sent_bytes = self.procfs.net_io()
+            return cpu_percent, cpu_max_core_percent, memory_percent, memory_available, busy_time, recv_bytes, sent_bytes
+
+        cpu_percent = psutil.cpu_percent(None)
+        cpu_max_core_percent = max(psutil.cpu_percent(None, percpu=True), default=cpu_percent)
+        memory = psutil.virtual_memory()
+        # busy_time is Linux only
+        disk = psutil.disk_io_counters()
+        busy_time = getattr(disk, "busy_time", None) if disk else None
+        network = psutil.net_io_counters()
+        recv_bytes = network.bytes_recv if network else None
+        sent_bytes = network.bytes_sent if network else None
+        return cpu_percent, cpu_max_core_percent, memory.percent, memory.available, busy_time, recv_bytes, sent_bytes
+
+    def sample(self):
+        """Take one sample of every metric"""
+        cpu_percent, cpu_max_core_percent, memory_percent, memory_available, busy_time, recv_bytes, sent_bytes = self.read_counters()
+        now = time.monotonic()
+
+        # Mounts that errored or timed out have no percent_used
+        percents = [disk["percent_used"] for disk in self.disk_reader.read(self.partitions) if "percent_used" in disk]
+        disk_percent_used = max(percents) if percents else None
+
+        # Share of wall time some disk was busy, like iostat's %util, and network throughput
+        disk_busy_percent = recv_rate = sent_rate = None
+        if self.last_sample_at is not None:
+            elapsed = now - self.last_sample_at
+            if busy_time is not None:
+                busy_rate = rate(busy_time, self.last_busy_time, elapsed * 1000)
+                disk_busy_percent = min(100.0, busy_rate * 100) if busy_rate is not None else None
+            if recv_bytes is not None:
+                recv_rate = rate(recv_bytes, self.last_recv_bytes, elapsed)
+                sent_rate = rate(sent_bytes, self.last_sent_bytes, elapsed)
+        self.last_sample_at = now
+        self.last_busy_time = busy_time
+        self.last_recv_bytes = recv_bytes
+        self.last_sent_bytes = sent_bytes
+
+        with self.lock:
+            self.buffers["cpu_percent"].append(cpu_percent)
+            self.buffers["cpu_max_core_percent"].append(cpu_max_core_percent)
+            self.buffers["memory_percent_used"].append(memory_percent)
+            self.buffers["memory_available"].append(memory_available)
+            if disk_percent_used is not None:
+                self.buffers["disk_percent_used"].append(disk_percent_used)
+            if disk_busy_percent is not None:
+                self.buffers["disk_busy_percent"].append(disk_busy_percent)
+            if recv_rate is not None:
+                self.buffers["network_recv_bytes_per_sec"].append(recv_rate)
+            if sent_rate is not None:
+                self.buffers["network_sent_bytes_per_sec"].append(sent_rate)
+
+    def run(self):
+        """Sample on a fixed schedule until stop() is called"""
+        next_sample = time.monotonic()
+        while not self.stop_event.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                print(f"Error sampling metrics: {e}")
+            next_sample += self.interval
+            # If a sample overran, skip the missed slots instead of bursting
+            now = time.monotonic()
+            if next_sample < now:
+                next_sample = now + self.interval
+            self.stop_event.wait(next_sample - now)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            # A sample in progress waits at most the statvfs timeout
+            self.thread.join(self.interval + self.disk_reader.timeout)
+        self.disk_reader.close()
+
+    def aggregate(self):
+        """Reduce the samples taken since the last call and start a new window"""
+        with self.lock:
+            window_end = time.time()
+            window = {
+                "window_start": int(self.window_start),
+                "window_end": int(window_end),
+                "interval": self.interval,
+                "samples": len(self.buffers["cpu_percent"])
+            }
+            for name, buffer in self.buffers.items():
+                if len(buffer):
+                    window[name] = summarize_buffer(buffer)
+                buffer.clear()
+            self.window_start = window_end
+        return window
@@ -0,0 +1,226 @@
+import email.utils
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+import agent_stats
+from outbox import BACKOFF_BASE, BACKOFF_MAX
+
+# Backoff and throttle state, kept between runs so cron-launched agents share it
+SCHEDULE_STATE_FILE = "upload_schedule.json"
+
+# Server latency above this makes the agent upload less often; below half of it, more often again
+LATENCY_TARGET = 2.0
+# Weight of the newest upload cycle in the latency average
+LATENCY_SMOOTHING = 0.3
+
+# At most, upload once every MAX_THROTTLE intervals; reports wait in the outbox meanwhile
+MAX_THROTTLE = 8
+
+# Statuses that mean "too many requests, come back later"
+RETRY_STATUSES = {429, 503}
+MAX_RETRY_AFTER = 3600
+
+def upload_offset(device_id, interval):
+    """Seconds into every interval at which this device uploads
+
+    A hash of device_id, so the same device always uses the same slot and a
+    fleet's uploads are spread evenly over the interval.
+    """
+    digest = hashlib.sha256(str(device_id).encode()).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 * interval
+
+def parse_retry_after(value, now):
+    """Seconds to wait from a Retry-After header, which is delta-seconds or an HTTP date"""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return min(int(value), MAX_RETRY_AFTER)
+    try:
+        return min(max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - now), MAX_RETRY_AFTER)
+    except (TypeError, ValueError):
+        return None
+
+class UploadScheduler:
+    """Decides when this agent uploads: its own slot in the interval, backoff and throttling
+
+    Every upload path reports the responses it gets through observe_response()
+    (attach() does that for an httpx client), so backoff is shared by the
+    Supabase and gateway uploads and, through the state file, by later runs.
+    A 429 or 503 with Retry-After is honoured, plus some jitter so agents told
+    the same thing don't come back together; other failures back off
+    exponentially with full jitter.
+
+    An upload cycle (one outbox flush, possibly several batches) runs from
+    start_cycle() to finish_cycle(). Its mean response time is one latency
+    sample: while it and the smoothed latency are above latency_target the
+    agent uploads only every throttle-th interval, doubling throttle once per
+    cycle, and steps back down once a cycle is fast again. ready() also turns
+    false mid-cycle once the cycle's responses are slow, so the rest of the
+    outbox waits for a later slot.
+    """
+
+    def __init__(self, device_id, interval, state_file=SCHEDULE_STATE_FILE, latency_target=LATENCY_TARGET, clock=time.time,
+                 rng=random):
+        self.interval = interval
+        self.offset = upload_offset(device_id, interval)
+        self.state_file = state_file
+        self.latency_target = latency_target
+        self.clock = clock
+        # Source of backoff jitter; tests pass a seeded random.Random
+        self.rng = rng
+        self.lock = threading.Lock()
+
+        self.failures = 0
+        self.backoff_until = 0.0
+        self.throttle = 1
+        self.last_upload = 0.0
+        self.latency = None
+        # Hints from the responses of the upload cycle in progress
+        self.retry_after = None
+        self.rate_limited = False
+        self.cycle_seconds = 0.0
+        self.cycle_responses = 0
+        self.load()
+
+    def load(self):
+        if not self.state_file:
+            return
+        try:
+            with open(self.state_file) as f:
+                state = json.load(f)
+            self.failures = state.get("failures", 0)
+            self.backoff_until = state.get("backoff_until", 0.0)
+            self.throttle = state.get("throttle", 1)
+            self.last_upload = state.get("last_upload", 0.0)
+            self.latency = state.get("latency")
+        except (OSError, ValueError):
+            # First run, or a corrupt file: start without backoff
+            pass
+
+    def save(self):
+        if not self.state_file:
+            return
+        state = {
+            "failures": self.failures,
+            "backoff_until": self.backoff_until,
+            "throttle": self.throttle,
+            "last_upload": self.last_upload,
+            "latency": self.latency
+        }
+        try:
+            tmp_file = self.state_file + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump(state, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            print(f"Error writing upload schedule state: {e}")
+
+    def seconds_until_slot(self):
+        """Time until this device's next slot, counted from the wall clock so agents started together still spread"""
+        return (self.offset - self.clock()) % self.interval
+
+    def ready(self):
+        """True if an upload may start now; otherwise the reports stay in the outbox"""
+        now = self.clock()
+        if now < self.backoff_until:
+            return False
+        # Throttled: skip slots, half an interval of slack for timing jitter
+        if self.throttle > 1 and now - self.last_upload < (self.throttle - 0.5) * self.interval:
+            return False
+        # The server got slow during this cycle: leave the remaining batches for later
+        if self.cycle_responses and self.cycle_seconds / self.cycle_responses > self.latency_target:
+            return False
+        return True
+
+    def delay(self):
+        """Seconds until ready() can be true again"""
+        now = self.clock()
+        waits = [self.backoff_until - now]
+        if self.throttle > 1:
+            waits.append(self.last_upload + (self.throttle - 0.5) * self.interval - now)
+        return max(0.0, *waits)
+
+    def observe_response(self, status, retry_after=None, seconds=None):
+        """Record one HTTP response of the current upload cycle"""
+        with self.lock:
+            if status in RETRY_STATUSES:
+                agent_stats.increment(f"upload.status_{status}")
+                self.rate_limited = True
+                self.retry_after = parse_retry_after(retry_after, self.clock())
+            elif seconds is not None:
+                # Rejected requests come back fast and would hide a slow server
+                self.cycle_seconds += seconds
+                self.cycle_responses += 1
+
+    def start_cycle(self):
+        """Call before the first batch of an upload cycle"""
+        with self.lock:
+            self.cycle_seconds = 0.0
+            self.cycle_responses = 0
+
+    def success(self):
+        """Call after each batch that went through"""
+        with self.lock:
+            self.failures = 0
+            self.backoff_until = 0.0
+            self.retry_after = None
+            self.rate_limited = False
+
+    def finish_cycle(self):
+        """Call once after an upload cycle that sent something: the only place throttle changes on latency"""
+        with self.lock:
+            self.last_upload = self.clock()
+            throttle = self.throttle
+            if self.cycle_responses:
+                seconds = self.cycle_seconds / self.cycle_responses
+                self.latency = seconds if self.latency is None else self.latency + LATENCY_SMOOTHING * (seconds - self.latency)
+                # One slow cycle on top of a slow average slows down; one fast cycle is enough to speed back up
+                if seconds > self.latency_target and self.latency > self.latency_target:
+                    self.throttle = min(MAX_THROTTLE, self.throttle * 2)
+                elif seconds < self.latency_target / 2 and self.throttle > 1:
+                    self.throttle -= 1
+            if self.throttle != throttle:
+                print(f"Server latency {self.latency:.2f}s, uploading every {self.throttle} intervals")
+            self.cycle_seconds = 0.0
+            self.cycle_responses = 0
+            self.save()
+
+    def failure(self):
+        """Call after an upload failed; returns how long uploads are now held back"""
+        with self.lock:
+            self.failures += 1
+            if self.retry_after is not None:
+                delay = self.retry_after + self.rng.uniform(0, self.retry_after / 4)
+            else:
+                # Full jitter keeps a fleet of agents from retrying in lockstep
+                delay = self.rng.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** self.failures))
+            if self.rate_limited:
+                # Being told to slow down counts like high latency
+                self.throttle = min(MAX_THROTTLE, self.throttle * 2)
+            self.backoff_until = self.clock() + delay
+            self.retry_after = None
+            self.rate_limited = False
+            self.cycle_seconds = 0.0
+            self.cycle_responses = 0
+            self.save()
+            return delay
+
+    def attach(self, client):
+        """Feed every response of an httpx.Client (such as the Supabase client's) to observe_response()"""
+        def on_request(request):
+            request.extensions["upload_started"] = time.perf_counter()
+
+        def on_response(response):
+            started = response.request.extensions.get("upload_started")
+            seconds = time.perf_counter() - started if started is not None else None
+            self.observe_response(response.status_code, response.headers.get("Retry-After"), seconds)
+
+        hooks = client.event_hooks
+        hooks["request"].append(on_request)
+        hooks["response"].append(on_response)
+        client.event_hooks = hooks
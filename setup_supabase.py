@@ -1,5 +1,6 @@
 from supabase import create_client, Client
 import json
+import os
 
 # Supabase configuration
 SUPABASE_URL = "https://gvvuhsiiwouxhfydansg.supabase.co"
@@ -31,18 +32,42 @@ def create_device_specs_table():
           disk_info JSONB,
           gpu_info JSONB,
           network_info JSONB,
+          top_processes JSONB,
+          metrics_window JSONB,
+          cgroups JSONB,
           timestamp BIGINT,
+          _agent_stats JSONB,
           created_at TIMESTAMPTZ DEFAULT NOW()
         );
+        
+        -- Columns added after the first release
+        ALTER TABLE device_specs ADD COLUMN IF NOT EXISTS _agent_stats JSONB;
+        ALTER TABLE device_specs ADD COLUMN IF NOT EXISTS top_processes JSONB;
+        ALTER TABLE device_specs ADD COLUMN IF NOT EXISTS metrics_window JSONB;
+        ALTER TABLE device_specs ADD COLUMN IF NOT EXISTS cgroups JSONB;
         """
         
         # Execute the SQL to create the table
         response = supabase.rpc('exec_sql', {'query': sql}).execute()
         print("Table creation response:", response)
         
-        # Create index and policies
+        # Make device_id unique so uploads can upsert in a single request,
+        # keeping only the newest row for devices that already have duplicates
         index_sql = """
-        CREATE INDEX IF NOT EXISTS idx_device_specs_device_id ON device_specs(device_id);
+        DELETE FROM device_specs
+          WHERE id IN (
+            SELECT id FROM (
+              SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY device_id
+                ORDER BY COALESCE(created_at, '-infinity') DESC, id DESC
+              ) AS newest
+              FROM device_specs
+            ) ranked
+            WHERE newest > 1
+          );
+        DROP INDEX IF EXISTS idx_device_specs_device_id;
+        CREATE UNIQUE INDEX IF NOT EXISTS device_specs_device_id_key ON device_specs(device_id);
+        CREATE INDEX IF NOT EXISTS idx_device_specs_created_at_id ON device_specs(created_at, id);
         """
         supabase.rpc('exec_sql', {'query': index_sql}).execute()
         
@@ -61,6 +86,34 @@ def create_device_specs_table():
           TO anon 
           WITH CHECK (true);
         
+        -- Upserts (INSERT ... ON CONFLICT DO UPDATE) also need an update policy;
+        -- the update is scoped to the conflict key by device_specs_keep_identity
+        DROP POLICY IF EXISTS "Allow anonymous update access" ON device_specs;
+        CREATE POLICY "Allow anonymous update access" 
+          ON device_specs FOR UPDATE 
+          TO anon 
+          USING (device_id IS NOT NULL)
+          WITH CHECK (device_id IS NOT NULL);
+        
+        -- Upserts may overwrite a device's row but not move it to another device
+        CREATE OR REPLACE FUNCTION device_specs_keep_identity()
+        RETURNS trigger
+        LANGUAGE plpgsql
+        AS $$
+        BEGIN
+          IF NEW.device_id IS DISTINCT FROM OLD.device_id OR NEW.id IS DISTINCT FROM OLD.id THEN
+            RAISE EXCEPTION 'device_specs rows cannot change device_id or id';
+          END IF;
+          NEW.created_at := OLD.created_at;
+          RETURN NEW;
+        END;
+        $$;
+        
+        DROP TRIGGER IF EXISTS device_specs_keep_identity ON device_specs;
+        CREATE TRIGGER device_specs_keep_identity
+          BEFORE UPDATE ON device_specs
+          FOR EACH ROW EXECUTE FUNCTION device_specs_keep_identity();
+        
         -- Enable RLS
         ALTER TABLE device_specs ENABLE ROW LEVEL SECURITY;
         COMMIT;
@@ -73,6 +126,22 @@ def create_device_specs_table():
         print(f"Error creating device_specs table: {e}")
         return False
 
+def create_device_metrics_tables():
+    """Create the device_metrics history table, its rollups and retention functions"""
+    try:
+        # The schema lives in supabase_metrics.sql so it can also be run by hand
+        with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "supabase_metrics.sql")) as f:
+            sql = f.read()
+        
+        response = supabase.rpc('exec_sql', {'query': sql}).execute()
+        print("Metrics tables creation response:", response)
+        
+        print("Successfully created device_metrics tables and policies")
+        return True
+    except Exception as e:
+        print(f"Error creating device_metrics tables: {e}")
+        return False
+
 def test_table_exists():
     """Test if the device_specs table exists"""
     try:
@@ -102,6 +171,10 @@ def main():
     print("\nVerifying table exists...")
     test_table_exists()
     
+    # History tables are created idempotently on every run
+    print("\nCreating device_metrics history tables...")
+    create_device_metrics_tables()
+    
     print("\nSetup complete!")
 
 if __name__ == "__main__":
@@ -0,0 +1,180 @@
+import json
+import os
+import struct
+import sys
+import zlib
+
+# Compact, schema-versioned encoding of one system_info report.
+#
+# Record layout (little-endian):
+#   header  magic "SPEC", schema version (u8), body length (u32), CRC32 of body (u32)
+#   body    presence mask (u8), the key position of each NUMERIC_FIELDS entry
+#           in the report (u8 each), one fixed-width slot per entry, then the
+#           remaining sections as compact UTF-8 JSON
+#
+# Fields whose bit is clear in the mask were missing, or not of the slot's
+# type, and travel in the JSON part as they are. The positions let the decoder
+# rebuild the report with its original key order.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MAGIC = b"SPEC"
+SNAPSHOT_CONTENT_TYPE = "application/x-spectre-snapshot"
+HEADER = struct.Struct("<4sBII")
+
+NUMERIC_FIELDS = [
+    ("timestamp", "q"),
+    ("memory_total", "Q"),
+    ("memory_available", "Q"),
+    ("memory_percent_used", "d"),
+    ("cpu_cores_physical", "H"),
+    ("cpu_cores_logical", "H")
+]
+NUMERIC_BLOCK = struct.Struct("<B" + "B" * len(NUMERIC_FIELDS) + "".join(code for _, code in NUMERIC_FIELDS))
+INTEGER_LIMITS = {"q": (-2 ** 63, 2 ** 63), "Q": (0, 2 ** 64), "H": (0, 2 ** 16)}
+
+# Local files, next to system_info.json
+LATEST_SNAPSHOT_FILE = "system_info.snap"
+SNAPSHOT_LOG_FILE = "snapshots.bin"
+SNAPSHOT_LOG_MAX_BYTES = 10 * 1024 * 1024
+SNAPSHOT_LOG_BACKUPS = 3
+
+class SnapshotError(ValueError):
+    """Raised when bytes are not a valid snapshot record"""
+
+def _fits(value, code):
+    """Check that value can go in a numeric slot of the given struct code"""
+    if isinstance(value, bool):
+        return False
+    if code == "d":
+        return isinstance(value, (int, float))
+    low, high = INTEGER_LIMITS[code]
+    return isinstance(value, int) and low <= value < high
+
+def encode_snapshot(report):
+    """Encode a report as one snapshot record"""
+    positions = {key: index for index, key in enumerate(report)}
+    mask = 0
+    slots = []
+    values = []
+    rest = dict(report)
+    for bit, (name, code) in enumerate(NUMERIC_FIELDS):
+        value = report.get(name)
+        if value is not None and _fits(value, code) and positions[name] < 256:
+            mask |= 1 << bit
+            slots.append(positions[name])
+            values.append(value)
+            del rest[name]
+        else:
+            slots.append(0)
+            values.append(0)
+
+    body = NUMERIC_BLOCK.pack(mask, *slots, *values) + json.dumps(rest, separators=(",", ":")).encode()
+    return HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(body), zlib.crc32(body)) + body
+
+def decode_snapshot(data, offset=0):
+    """Decode the record starting at offset, returning (report, offset of the next record)"""
+    if len(data) - offset < HEADER.size:
+        raise SnapshotError("truncated snapshot header")
+    magic, version, length, crc = HEADER.unpack_from(data, offset)
+    if magic != SNAPSHOT_MAGIC:
+        raise SnapshotError("not a snapshot record")
+    if version != SNAPSHOT_VERSION:
+        raise SnapshotError(f"unsupported snapshot version {version}")
+
+    start = offset + HEADER.size
+    body = bytes(data[start:start + length])
+    if len(body) != length or zlib.crc32(body) != crc:
+        raise SnapshotError("truncated or corrupt snapshot body")
+
+    fields = NUMERIC_BLOCK.unpack_from(body)
+    count = len(NUMERIC_FIELDS)
+    mask, slots, values = fields[0], fields[1:1 + count], fields[1 + count:]
+    items = list(json.loads(body[NUMERIC_BLOCK.size:]).items())
+
+    # Re-insert the numeric fields at their original positions, lowest first
+    numeric = sorted(
+        (slot, name, value)
+        for bit, ((name, _), slot, value) in enumerate(zip(NUMERIC_FIELDS, slots, values))
+        if mask & (1 << bit)
+    )
+    for slot, name, value in numeric:
+        items.insert(slot, (name, value))
+    return dict(items), start + length
+
+def iter_snapshots(data):
+    """Yield every report in a buffer of concatenated records, stopping at a torn tail"""
+    offset = 0
+    while offset < len(data):
+        try:
+            report, offset = decode_snapshot(data, offset)
+        except SnapshotError:
+            # A crash mid-append leaves a partial last record
+            return
+        yield report
+
+def write_snapshot(path, record):
+    """Atomically replace path with one encoded record"""
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(record)
+    os.replace(tmp_file, path)
+
+class SnapshotLog:
+    """Append-only rolling file of snapshot records"""
+
+    def __init__(self, path=SNAPSHOT_LOG_FILE, max_bytes=SNAPSHOT_LOG_MAX_BYTES, backups=SNAPSHOT_LOG_BACKUPS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+
+    def rotate(self):
+        """Shift path -> path.1 -> path.2 ..., dropping the oldest"""
+        for index in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{index}"):
+                os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def append(self, record):
+        """Append one encoded record, rotating first if the file would grow past max_bytes"""
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(record) > self.max_bytes:
+                self.rotate()
+            # A single O_APPEND write keeps records whole even with several writers
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, record)
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"Error appending to snapshot log: {e}")
+
+def read_snapshot_file(path):
+    """Return every report stored in a snapshot file"""
+    with open(path, "rb") as f:
+        return list(iter_snapshots(f.read()))
+
+def convert_to_json(path, all_records=False):
+    """Regenerate readable JSON from a snapshot file: the last report, or all of them"""
+    reports = read_snapshot_file(path)
+    if all_records:
+        return json.dumps(reports, indent=4)
+    return json.dumps(reports[-1] if reports else None, indent=4)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert snapshot files back to readable JSON")
+    parser.add_argument("path", nargs="?", default=LATEST_SNAPSHOT_FILE, help=f"snapshot file (default: {LATEST_SNAPSHOT_FILE})")
+    parser.add_argument("--all", action="store_true", help="output every report in the file, not only the last one")
+    parser.add_argument("--output", help="write to this file instead of stdout, e.g. system_info.json")
+    args = parser.parse_args()
+
+    output = convert_to_json(args.path, args.all)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"Wrote {args.output}")
+    else:
+        sys.stdout.write(output + "\n")
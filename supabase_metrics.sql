@@ -0,0 +1,365 @@
+-- Time-series history for the changing metrics of each device.
+-- device_specs keeps one row of static inventory per device; every sample
+-- the collector takes is appended here as one narrow row.
+
+-- Raw samples, partitioned by day
+CREATE TABLE IF NOT EXISTS device_metrics (
+  device_id UUID NOT NULL,
+  ts TIMESTAMPTZ NOT NULL,
+  memory_available BIGINT,
+  memory_percent_used FLOAT,
+  cpu_frequency_current FLOAT,
+  disk_used BIGINT,
+  disk_percent_used FLOAT,
+  gpu_load FLOAT,
+  gpu_temperature FLOAT,
+  -- When the row arrived; rollups follow this, so a late outbox backlog is still rolled up
+  ingested_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  -- Also the (device_id, ts) index on every partition
+  PRIMARY KEY (device_id, ts)
+) PARTITION BY RANGE (ts);
+
+-- Raw per-cgroup samples (containers and services on Linux hosts), partitioned by day
+CREATE TABLE IF NOT EXISTS device_cgroup_metrics (
+  device_id UUID NOT NULL,
+  ts TIMESTAMPTZ NOT NULL,
+  cgroup TEXT NOT NULL,
+  memory_current BIGINT,
+  cpu_percent FLOAT,
+  io_read_bytes_per_sec BIGINT,
+  io_write_bytes_per_sec BIGINT,
+  PRIMARY KEY (device_id, cgroup, ts)
+) PARTITION BY RANGE (ts);
+
+-- Rollups: 1-minute buckets from raw samples, 1-hour from 1-minute, 1-day from 1-hour
+CREATE TABLE IF NOT EXISTS device_metrics_1m (
+  device_id UUID NOT NULL,
+  bucket TIMESTAMPTZ NOT NULL,
+  samples INTEGER NOT NULL,
+  memory_available_avg BIGINT,
+  memory_available_min BIGINT,
+  memory_percent_used_avg FLOAT,
+  memory_percent_used_max FLOAT,
+  cpu_frequency_avg FLOAT,
+  disk_used_max BIGINT,
+  disk_percent_used_max FLOAT,
+  gpu_load_avg FLOAT,
+  gpu_load_max FLOAT,
+  gpu_temperature_max FLOAT,
+  -- When the bucket was last recomputed, so the next level knows what to redo
+  refreshed_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+  PRIMARY KEY (device_id, bucket)
+);
+
+CREATE TABLE IF NOT EXISTS device_metrics_1h (LIKE device_metrics_1m INCLUDING ALL);
+CREATE TABLE IF NOT EXISTS device_metrics_1d (LIKE device_metrics_1m INCLUDING ALL);
+
+-- Tables created before ingest-time rollups: rows already there count as long rolled up
+ALTER TABLE device_metrics ADD COLUMN IF NOT EXISTS ingested_at TIMESTAMPTZ NOT NULL DEFAULT '-infinity';
+ALTER TABLE device_metrics ALTER COLUMN ingested_at SET DEFAULT NOW();
+ALTER TABLE device_metrics_1m ADD COLUMN IF NOT EXISTS refreshed_at TIMESTAMPTZ NOT NULL DEFAULT '-infinity';
+ALTER TABLE device_metrics_1m ALTER COLUMN refreshed_at SET DEFAULT NOW();
+ALTER TABLE device_metrics_1h ADD COLUMN IF NOT EXISTS refreshed_at TIMESTAMPTZ NOT NULL DEFAULT '-infinity';
+ALTER TABLE device_metrics_1h ALTER COLUMN refreshed_at SET DEFAULT NOW();
+ALTER TABLE device_metrics_1d ADD COLUMN IF NOT EXISTS refreshed_at TIMESTAMPTZ NOT NULL DEFAULT '-infinity';
+ALTER TABLE device_metrics_1d ALTER COLUMN refreshed_at SET DEFAULT NOW();
+
+CREATE INDEX IF NOT EXISTS device_metrics_ingested_at_idx ON device_metrics (ingested_at);
+CREATE INDEX IF NOT EXISTS device_metrics_1m_refreshed_at_idx ON device_metrics_1m (refreshed_at);
+CREATE INDEX IF NOT EXISTS device_metrics_1h_refreshed_at_idx ON device_metrics_1h (refreshed_at);
+
+-- Rows for days without a daily partition (partition maintenance not run for
+-- a while, outbox backlog older than the raw retention, a skewed clock) land
+-- here instead of failing the insert
+CREATE TABLE IF NOT EXISTS device_metrics_default PARTITION OF device_metrics DEFAULT;
+CREATE TABLE IF NOT EXISTS device_cgroup_metrics_default PARTITION OF device_cgroup_metrics DEFAULT;
+
+-- Create the daily partition of parent for one day. Rows for that day already
+-- in the default partition are moved into it first, since a partition can't
+-- be attached while the default partition holds rows in its range.
+-- Partitions are tables PostgREST can reach on their own, and RLS on the
+-- parent doesn't cover that, so each gets RLS with no policies: only access
+-- through the parent, under the parent's policies, goes through.
+CREATE OR REPLACE FUNCTION create_metrics_partition(parent TEXT, day DATE)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  partition_name TEXT := parent || '_p' || to_char(day, 'YYYYMMDD');
+BEGIN
+  IF to_regclass(partition_name) IS NOT NULL THEN
+    RETURN;
+  END IF;
+  EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name, parent);
+  EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', partition_name);
+  EXECUTE format(
+    'WITH moved AS (DELETE FROM %I WHERE ts >= %L AND ts < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+    parent || '_default', day, day + 1, partition_name
+  );
+  EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)', parent, partition_name, day, day + 1);
+END;
+$$;
+
+-- Create the daily partitions of both raw tables from yesterday up to days_ahead days from now.
+-- Inserts for a day without a partition go to the default partition, which is
+-- slower to query and prune, so this should run at least once every days_ahead
+-- days (it is scheduled below when pg_cron is available).
+CREATE OR REPLACE FUNCTION create_device_metrics_partitions(days_ahead INTEGER DEFAULT 7)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  day DATE;
+BEGIN
+  FOR day IN
+    SELECT generate_series(CURRENT_DATE - 1, CURRENT_DATE + days_ahead, INTERVAL '1 day')::DATE
+  LOOP
+    PERFORM create_metrics_partition('device_metrics', day);
+    PERFORM create_metrics_partition('device_cgroup_metrics', day);
+  END LOOP;
+END;
+$$;
+
+SELECT create_device_metrics_partitions();
+
+-- Recompute every rollup bucket that got raw samples ingested since since,
+-- however old the samples themselves are (an outbox flushed after days
+-- offline). Each level is built from the one below it, with averages
+-- weighted by sample count, and redoes the buckets whose inputs were
+-- refreshed in this run (NOW() is fixed for the transaction).
+CREATE OR REPLACE FUNCTION refresh_device_metrics_rollups(since TIMESTAMPTZ DEFAULT NOW() - INTERVAL '2 hours')
+RETURNS void
+LANGUAGE sql
+AS $$
+  WITH touched AS (
+    SELECT DISTINCT device_id, date_trunc('minute', ts) AS bucket
+    FROM device_metrics
+    WHERE ingested_at >= since
+  )
+  INSERT INTO device_metrics_1m
+  SELECT
+    t.device_id,
+    t.bucket,
+    COUNT(*),
+    AVG(memory_available)::BIGINT,
+    MIN(memory_available),
+    AVG(memory_percent_used),
+    MAX(memory_percent_used),
+    AVG(cpu_frequency_current),
+    MAX(disk_used),
+    MAX(disk_percent_used),
+    AVG(gpu_load),
+    MAX(gpu_load),
+    MAX(gpu_temperature)
+  FROM touched t
+  JOIN device_metrics m ON m.device_id = t.device_id AND m.ts >= t.bucket AND m.ts < t.bucket + INTERVAL '1 minute'
+  GROUP BY 1, 2
+  ON CONFLICT (device_id, bucket) DO UPDATE SET
+    samples = EXCLUDED.samples,
+    memory_available_avg = EXCLUDED.memory_available_avg,
+    memory_available_min = EXCLUDED.memory_available_min,
+    memory_percent_used_avg = EXCLUDED.memory_percent_used_avg,
+    memory_percent_used_max = EXCLUDED.memory_percent_used_max,
+    cpu_frequency_avg = EXCLUDED.cpu_frequency_avg,
+    disk_used_max = EXCLUDED.disk_used_max,
+    disk_percent_used_max = EXCLUDED.disk_percent_used_max,
+    gpu_load_avg = EXCLUDED.gpu_load_avg,
+    gpu_load_max = EXCLUDED.gpu_load_max,
+    gpu_temperature_max = EXCLUDED.gpu_temperature_max,
+    refreshed_at = EXCLUDED.refreshed_at;
+
+  WITH touched AS (
+    SELECT DISTINCT device_id, date_trunc('hour', bucket) AS bucket
+    FROM device_metrics_1m
+    WHERE refreshed_at >= NOW()
+  )
+  INSERT INTO device_metrics_1h
+  SELECT
+    t.device_id,
+    t.bucket,
+    SUM(samples),
+    (SUM(memory_available_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE memory_available_avg IS NOT NULL), 0))::BIGINT,
+    MIN(memory_available_min),
+    SUM(memory_percent_used_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE memory_percent_used_avg IS NOT NULL), 0),
+    MAX(memory_percent_used_max),
+    SUM(cpu_frequency_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE cpu_frequency_avg IS NOT NULL), 0),
+    MAX(disk_used_max),
+    MAX(disk_percent_used_max),
+    SUM(gpu_load_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE gpu_load_avg IS NOT NULL), 0),
+    MAX(gpu_load_max),
+    MAX(gpu_temperature_max)
+  FROM touched t
+  JOIN device_metrics_1m m ON m.device_id = t.device_id AND m.bucket >= t.bucket AND m.bucket < t.bucket + INTERVAL '1 hour'
+  GROUP BY 1, 2
+  ON CONFLICT (device_id, bucket) DO UPDATE SET
+    samples = EXCLUDED.samples,
+    memory_available_avg = EXCLUDED.memory_available_avg,
+    memory_available_min = EXCLUDED.memory_available_min,
+    memory_percent_used_avg = EXCLUDED.memory_percent_used_avg,
+    memory_percent_used_max = EXCLUDED.memory_percent_used_max,
+    cpu_frequency_avg = EXCLUDED.cpu_frequency_avg,
+    disk_used_max = EXCLUDED.disk_used_max,
+    disk_percent_used_max = EXCLUDED.disk_percent_used_max,
+    gpu_load_avg = EXCLUDED.gpu_load_avg,
+    gpu_load_max = EXCLUDED.gpu_load_max,
+    gpu_temperature_max = EXCLUDED.gpu_temperature_max,
+    refreshed_at = EXCLUDED.refreshed_at;
+
+  WITH touched AS (
+    SELECT DISTINCT device_id, date_trunc('day', bucket) AS bucket
+    FROM device_metrics_1h
+    WHERE refreshed_at >= NOW()
+  )
+  INSERT INTO device_metrics_1d
+  SELECT
+    t.device_id,
+    t.bucket,
+    SUM(samples),
+    (SUM(memory_available_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE memory_available_avg IS NOT NULL), 0))::BIGINT,
+    MIN(memory_available_min),
+    SUM(memory_percent_used_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE memory_percent_used_avg IS NOT NULL), 0),
+    MAX(memory_percent_used_max),
+    SUM(cpu_frequency_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE cpu_frequency_avg IS NOT NULL), 0),
+    MAX(disk_used_max),
+    MAX(disk_percent_used_max),
+    SUM(gpu_load_avg * samples) / NULLIF(SUM(samples) FILTER (WHERE gpu_load_avg IS NOT NULL), 0),
+    MAX(gpu_load_max),
+    MAX(gpu_temperature_max)
+  FROM touched t
+  JOIN device_metrics_1h m ON m.device_id = t.device_id AND m.bucket >= t.bucket AND m.bucket < t.bucket + INTERVAL '1 day'
+  GROUP BY 1, 2
+  ON CONFLICT (device_id, bucket) DO UPDATE SET
+    samples = EXCLUDED.samples,
+    memory_available_avg = EXCLUDED.memory_available_avg,
+    memory_available_min = EXCLUDED.memory_available_min,
+    memory_percent_used_avg = EXCLUDED.memory_percent_used_avg,
+    memory_percent_used_max = EXCLUDED.memory_percent_used_max,
+    cpu_frequency_avg = EXCLUDED.cpu_frequency_avg,
+    disk_used_max = EXCLUDED.disk_used_max,
+    disk_percent_used_max = EXCLUDED.disk_percent_used_max,
+    gpu_load_avg = EXCLUDED.gpu_load_avg,
+    gpu_load_max = EXCLUDED.gpu_load_max,
+    gpu_temperature_max = EXCLUDED.gpu_temperature_max,
+    refreshed_at = EXCLUDED.refreshed_at;
+$$;
+
+-- Retention: drop whole raw partitions, delete old rows from the default partitions and old rollup buckets
+CREATE OR REPLACE FUNCTION prune_device_metrics(
+  raw_retention INTERVAL DEFAULT INTERVAL '7 days',
+  minute_retention INTERVAL DEFAULT INTERVAL '30 days',
+  hour_retention INTERVAL DEFAULT INTERVAL '1 year',
+  day_retention INTERVAL DEFAULT INTERVAL '5 years'
+)
+RETURNS void
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  partition_name TEXT;
+BEGIN
+  FOR partition_name IN
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent IN ('device_metrics'::regclass, 'device_cgroup_metrics'::regclass)
+      AND c.relname ~ '^device_(cgroup_)?metrics_p[0-9]{8}$'
+      AND to_date(right(c.relname, 8), 'YYYYMMDD') + 1 <= (NOW() - raw_retention)::DATE
+  LOOP
+    EXECUTE format('DROP TABLE IF EXISTS %I', partition_name);
+  END LOOP;
+
+  DELETE FROM device_metrics_default WHERE ts < NOW() - raw_retention;
+  DELETE FROM device_cgroup_metrics_default WHERE ts < NOW() - raw_retention;
+
+  DELETE FROM device_metrics_1m WHERE bucket < NOW() - minute_retention;
+  DELETE FROM device_metrics_1h WHERE bucket < NOW() - hour_retention;
+  DELETE FROM device_metrics_1d WHERE bucket < NOW() - day_retention;
+END;
+$$;
+
+-- Run rollups every minute and partition maintenance daily when pg_cron is installed
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('device-metrics-rollups', '* * * * *', 'SELECT refresh_device_metrics_rollups()');
+    PERFORM cron.schedule('device-metrics-maintenance', '15 0 * * *', 'SELECT create_device_metrics_partitions(); SELECT prune_device_metrics()');
+  END IF;
+END;
+$$;
+
+-- Latest sample per device: one index probe per device instead of a scan of the history
+CREATE OR REPLACE FUNCTION get_latest_device_metrics()
+RETURNS SETOF device_metrics
+LANGUAGE sql
+AS $$
+  SELECT m.*
+  FROM device_specs d
+  CROSS JOIN LATERAL (
+    SELECT *
+    FROM device_metrics
+    WHERE device_metrics.device_id = d.device_id
+    ORDER BY ts DESC
+    LIMIT 1
+  ) m;
+$$;
+
+-- Policies: anyone can read, the collector can append samples
+ALTER TABLE device_metrics ENABLE ROW LEVEL SECURITY;
+ALTER TABLE device_metrics_default ENABLE ROW LEVEL SECURITY;
+ALTER TABLE device_cgroup_metrics_default ENABLE ROW LEVEL SECURITY;
+ALTER TABLE device_metrics_1m ENABLE ROW LEVEL SECURITY;
+ALTER TABLE device_metrics_1h ENABLE ROW LEVEL SECURITY;
+ALTER TABLE device_metrics_1d ENABLE ROW LEVEL SECURITY;
+ALTER TABLE device_cgroup_metrics ENABLE ROW LEVEL SECURITY;
+
+-- Daily partitions created before create_metrics_partition enabled RLS itself
+DO $$
+DECLARE
+  partition_name TEXT;
+BEGIN
+  FOR partition_name IN
+    SELECT c.relname
+    FROM pg_inherits i
+    JOIN pg_class c ON c.oid = i.inhrelid
+    WHERE i.inhparent IN ('device_metrics'::regclass, 'device_cgroup_metrics'::regclass)
+  LOOP
+    EXECUTE format('ALTER TABLE %I ENABLE ROW LEVEL SECURITY', partition_name);
+  END LOOP;
+END;
+$$;
+
+DROP POLICY IF EXISTS "Allow public read access" ON device_metrics;
+CREATE POLICY "Allow public read access"
+  ON device_metrics FOR SELECT
+  USING (true);
+
+DROP POLICY IF EXISTS "Allow anonymous insert access" ON device_metrics;
+CREATE POLICY "Allow anonymous insert access"
+  ON device_metrics FOR INSERT
+  TO anon
+  WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Allow public read access" ON device_cgroup_metrics;
+CREATE POLICY "Allow public read access"
+  ON device_cgroup_metrics FOR SELECT
+  USING (true);
+
+DROP POLICY IF EXISTS "Allow anonymous insert access" ON device_cgroup_metrics;
+CREATE POLICY "Allow anonymous insert access"
+  ON device_cgroup_metrics FOR INSERT
+  TO anon
+  WITH CHECK (true);
+
+DROP POLICY IF EXISTS "Allow public read access" ON device_metrics_1m;
+CREATE POLICY "Allow public read access"
+  ON device_metrics_1m FOR SELECT
+  USING (true);
+
+DROP POLICY IF EXISTS "Allow public read access" ON device_metrics_1h;
+CREATE POLICY "Allow public read access"
+  ON device_metrics_1h FOR SELECT
+  USING (true);
+
+DROP POLICY IF EXISTS "Allow public read access" ON device_metrics_1d;
+CREATE POLICY "Allow public read access"
+  ON device_metrics_1d FOR SELECT
+  USING (true);
@@ -18,12 +18,41 @@ CREATE TABLE IF NOT EXISTS device_specs (
   disk_info JSONB,
   gpu_info JSONB,
   network_info JSONB,
+  top_processes JSONB,
+  metrics_window JSONB,
+  cgroups JSONB,
   timestamp BIGINT,
+  _agent_stats JSONB,
   created_at TIMESTAMPTZ DEFAULT NOW()
 );
 
--- Create an index on device_id for faster lookups
-CREATE INDEX IF NOT EXISTS idx_device_specs_device_id ON device_specs(device_id);
+-- Columns added after the first release
+ALTER TABLE device_specs ADD COLUMN IF NOT EXISTS _agent_stats JSONB;
+ALTER TABLE device_specs ADD COLUMN IF NOT EXISTS top_processes JSONB;
+ALTER TABLE device_specs ADD COLUMN IF NOT EXISTS metrics_window JSONB;
+ALTER TABLE device_specs ADD COLUMN IF NOT EXISTS cgroups JSONB;
+
+-- Keep only the newest row per device so device_id can be made unique
+-- (rows without created_at count as the oldest, so they are deduped too)
+DELETE FROM device_specs
+  WHERE id IN (
+    SELECT id FROM (
+      SELECT id, ROW_NUMBER() OVER (
+        PARTITION BY device_id
+        ORDER BY COALESCE(created_at, '-infinity') DESC, id DESC
+      ) AS newest
+      FROM device_specs
+    ) ranked
+    WHERE newest > 1
+  );
+
+-- Make device_id unique so the collector can upsert in a single request
+-- (this unique index also replaces the old non-unique lookup index)
+DROP INDEX IF EXISTS idx_device_specs_device_id;
+CREATE UNIQUE INDEX IF NOT EXISTS device_specs_device_id_key ON device_specs(device_id);
+
+-- Lets bulk_export.py page through the table in (created_at, id) order
+CREATE INDEX IF NOT EXISTS idx_device_specs_created_at_id ON device_specs(created_at, id);
 
 -- Create a policy to allow anyone to select from the table (for the frontend)
 CREATE POLICY "Allow public read access" 
@@ -36,15 +65,44 @@ CREATE POLICY "Allow authenticated insert access"
   TO authenticated 
   WITH CHECK (true);
 
+-- Upserts (INSERT ... ON CONFLICT DO UPDATE) also need an update policy;
+-- the update is scoped to the conflict key by device_specs_keep_identity
+CREATE POLICY "Allow authenticated update access" 
+  ON device_specs FOR UPDATE 
+  TO authenticated 
+  USING (device_id IS NOT NULL)
+  WITH CHECK (device_id IS NOT NULL);
+
+-- Upserts may overwrite a device's row but not move it to another device
+CREATE OR REPLACE FUNCTION device_specs_keep_identity()
+RETURNS trigger
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF NEW.device_id IS DISTINCT FROM OLD.device_id OR NEW.id IS DISTINCT FROM OLD.id THEN
+    RAISE EXCEPTION 'device_specs rows cannot change device_id or id';
+  END IF;
+  NEW.created_at := OLD.created_at;
+  RETURN NEW;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS device_specs_keep_identity ON device_specs;
+CREATE TRIGGER device_specs_keep_identity
+  BEFORE UPDATE ON device_specs
+  FOR EACH ROW EXECUTE FUNCTION device_specs_keep_identity();
+
 -- Enable RLS (Row Level Security)
 ALTER TABLE device_specs ENABLE ROW LEVEL SECURITY;
 
 -- Create a function to get the latest device specs
+-- (device_id is unique, so this is one row per device; the metrics
+-- history lives in device_metrics, see supabase_metrics.sql)
 CREATE OR REPLACE FUNCTION get_latest_device_specs()
 RETURNS SETOF device_specs
 LANGUAGE sql
 AS $$
-  SELECT DISTINCT ON (device_id) *
+  SELECT *
   FROM device_specs
-  ORDER BY device_id, created_at DESC;
+  ORDER BY device_id;
 $$;
@@ -0,0 +1,70 @@
+import importlib.util
+import os
+import sys
+import time
+
+# The desktop app lives in a folder that isn't a package
+COLLECTOR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "python .exe maker", "collector.py")
+spec = importlib.util.spec_from_file_location("collector", COLLECTOR_PATH)
+collector = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(collector)
+
+import main
+
+def collect_fast(result):
+    result["fast"] = 1
+
+def collect_failing(result):
+    result["partial"] = 1
+    raise RuntimeError("collector broke")
+
+def collect_slow(result):
+    time.sleep(5)
+    result["slow"] = 1
+
+def test_collectors_are_the_agents():
+    # One implementation: the app and the agent can't drift apart
+    for name, _, function in collector.COLLECTORS:
+        assert function is getattr(main, function.__name__), name
+
+def test_iter_system_info_reports_progress():
+    collectors = collector.COLLECTORS
+    collector.COLLECTORS = [
+        ("slow", "slow thing", collect_slow),
+        ("failing", "failing thing", collect_failing),
+        ("fast", "fast thing", collect_fast),
+    ]
+    try:
+        started = time.monotonic()
+        progress = list(collector.iter_system_info(timeout=0.5))
+        assert time.monotonic() - started < 2
+    finally:
+        collector.COLLECTORS = collectors
+
+    # The slow collector timed out; a failing one counts as finished with nothing collected
+    assert sorted(name for name, _, _, _, _ in progress) == ["failing", "fast"]
+    assert [completed for _, _, _, completed, _ in progress] == [1, 2]
+    assert all(total == 3 for _, _, _, _, total in progress)
+    system_info = progress[-1][2]
+    assert system_info["fast"] == 1 and "partial" not in system_info and "slow" not in system_info
+    assert "timestamp" in system_info
+
+def test_collects_a_real_report():
+    progress = list(collector.iter_system_info())
+    assert progress[-1][3] == len(collector.COLLECTORS)
+    system_info = progress[-1][2]
+    # Keys come in report order whichever collector finished first
+    keys = list(system_info)
+    assert keys.index("device_id") < keys.index("system") < keys.index("memory_total") < keys.index("network_info")
+    assert system_info["memory_total"] > 0
+
+if __name__ == "__main__":
+    print("=== Desktop App Collector Test ===")
+    try:
+        test_collectors_are_the_agents()
+        test_iter_system_info_reports_progress()
+        test_collects_a_real_report()
+    except AssertionError as e:
+        print(f"FAILED: {e}")
+        sys.exit(1)
+    print("Desktop app collector tests passed")
@@ -0,0 +1,214 @@
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# A fake nvidia-smi, so the backend can be tested on machines without a GPU.
+# Each run of the --loop-ms mode takes its settings from the STUB_RUNS list
+# (the last entry repeats): print lines after delay seconds, then keep printing
+# them every loop, or exit right away. -L lists one GPU unless STUB_NO_GPU is set.
+STUB_SCRIPT = """#!{python}
+import json, os, sys, time
+
+def log(entry):
+    with open(os.environ["STUB_LOG"], "a") as f:
+        f.write(entry + "\\n")
+
+if "-L" in sys.argv:
+    log("list")
+    if os.environ.get("STUB_NO_GPU"):
+        print("No devices were found")
+        sys.exit(6)
+    print("GPU 0: Stub GPU (UUID: GPU-00000000)")
+    sys.exit(0)
+
+runs = json.loads(os.environ["STUB_RUNS"])
+with open(os.environ["STUB_LOG"]) as f:
+    run = runs[min(sum(1 for line in f if line.startswith("loop")), len(runs) - 1)]
+log("loop")
+loop_seconds = int([arg for arg in sys.argv if arg.startswith("--loop-ms=")][0].split("=")[1]) / 1000
+time.sleep(run.get("delay", 0))
+while True:
+    for line in run["lines"]:
+        print(line, flush=True)
+    if run.get("exit"):
+        sys.exit(3)
+    time.sleep(loop_seconds)
+"""
+
+STUB_DIR = tempfile.mkdtemp(prefix="spectre-gpu-test-")
+STUB_PATH = os.path.join(STUB_DIR, "nvidia-smi")
+with open(STUB_PATH, "w") as f:
+    f.write(STUB_SCRIPT.format(python=sys.executable))
+os.chmod(STUB_PATH, 0o755)
+atexit.register(shutil.rmtree, STUB_DIR, True)
+
+# Read by gpu.py when it is imported
+os.environ["SPECTRE_NVIDIA_SMI"] = STUB_PATH
+import gpu
+import schema
+
+GPU_LINE = "0, Stub GPU, 45, 8192, 1024, 7168, 61"
+SECOND_GPU_LINE = "1, Stub GPU, [N/A], 8192, [N/A], [N/A], [Not Supported]"
+
+def use_stub(runs, no_gpu=False):
+    """Configure the stub for the next test and return the path of its invocation log"""
+    log = os.path.join(STUB_DIR, "stub.log")
+    open(log, "w").close()
+    os.environ["STUB_LOG"] = log
+    os.environ["STUB_RUNS"] = json.dumps(runs)
+    if no_gpu:
+        os.environ["STUB_NO_GPU"] = "1"
+    else:
+        os.environ.pop("STUB_NO_GPU", None)
+    return log
+
+def test_parse_nvidia_smi_line():
+    gpu_info = gpu.parse_nvidia_smi_line(GPU_LINE + "\n")
+    assert gpu_info == {
+        "id": 0, "name": "Stub GPU", "load": 0.45, "memory_total": 8192.0,
+        "memory_used": 1024.0, "memory_free": 7168.0, "temperature": 61.0
+    }
+    # Names may contain commas; the other fields are counted from the end
+    assert gpu.parse_nvidia_smi_line("2, Tesla, Rev A, 10, 1, 1, 0, 50")["name"] == "Tesla, Rev A"
+    assert gpu.parse_nvidia_smi_line("x, Stub GPU, 1, 1, 1, 1, 1") is None
+    assert gpu.parse_nvidia_smi_line("not csv") is None
+
+def test_unavailable_fields_are_none():
+    gpu_info = gpu.parse_nvidia_smi_line(SECOND_GPU_LINE)
+    assert gpu_info["id"] == 1 and gpu_info["memory_total"] == 8192.0
+    assert gpu_info["load"] is None
+    assert gpu_info["memory_used"] is None and gpu_info["memory_free"] is None
+    assert gpu_info["temperature"] is None
+
+def test_backend_serves_latest_output():
+    use_stub([{"lines": [GPU_LINE, SECOND_GPU_LINE]}])
+    backend = gpu.NvidiaSmiBackend(STUB_PATH, loop_ms=50)
+    try:
+        # The first line can be served before the second one is read
+        deadline = time.monotonic() + 5
+        while len(backend.sample()) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        gpu_info = backend.sample()
+        assert [entry["id"] for entry in gpu_info] == [0, 1]
+        assert gpu_info[0]["load"] == 0.45 and gpu_info[1]["load"] is None
+        # Served from the running process, not by starting another one
+        assert backend.sample() == gpu_info
+        assert backend.process.poll() is None
+    finally:
+        backend.close()
+
+def test_restarts_after_process_dies():
+    log = use_stub([
+        {"lines": [GPU_LINE], "exit": True},
+        {"lines": ["0, Stub GPU, 90, 8192, 4096, 4096, 80"], "delay": 0.5}
+    ])
+    restart_backoff = gpu.RESTART_BACKOFF
+    backend = gpu.NvidiaSmiBackend(STUB_PATH, loop_ms=50)
+    try:
+        assert backend.sample()[0]["load"] == 0.45
+        backend.process.wait(5)
+        # Within the backoff the exit is reported instead of restarting
+        assert "error" in backend.sample()[0]
+
+        gpu.RESTART_BACKOFF = 0
+        gpu_info = backend.sample()
+        # The first reading of the new process, never the dead one's last
+        assert gpu_info[0]["load"] == 0.9, gpu_info
+        with open(log) as f:
+            assert sum(1 for line in f if line.startswith("loop")) == 2
+    finally:
+        gpu.RESTART_BACKOFF = restart_backoff
+        backend.close()
+
+def test_no_gpu_result_is_cached():
+    log = use_stub([{"lines": []}], no_gpu=True)
+    gpu_cache_file = gpu.GPU_CACHE_FILE
+    import_pynvml = gpu.import_pynvml
+    gpu.GPU_CACHE_FILE = os.path.join(STUB_DIR, "gpu_cache.json")
+    # Only the nvidia-smi path is under test
+    gpu.import_pynvml = lambda: None
+    try:
+        assert gpu.detect_gpu_backend("host-a").name == "none"
+        assert os.path.exists(gpu.GPU_CACHE_FILE)
+        with open(log) as f:
+            assert f.read().count("list") == 1
+
+        # Cached: nvidia-smi isn't run again for the same hardware key...
+        assert gpu.detect_gpu_backend("host-a").name == "none"
+        with open(log) as f:
+            assert f.read().count("list") == 1
+
+        # ...but is for another one
+        os.environ.pop("STUB_NO_GPU")
+        backend = gpu.detect_gpu_backend("host-b")
+        try:
+            assert backend.name == "nvidia-smi"
+        finally:
+            backend.close()
+    finally:
+        gpu.GPU_CACHE_FILE = gpu_cache_file
+        gpu.import_pynvml = import_pynvml
+
+class FakeTable:
+    """Records the rows upserted into one table of FakeSupabase"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def upsert(self, rows, **kwargs):
+        self.rows.extend(rows)
+        return self
+
+    def execute(self):
+        return None
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables = {}
+
+    def table(self, name):
+        return FakeTable(self.tables.setdefault(name, []))
+
+def test_metrics_row_skips_unavailable_readings():
+    report = {"device_id": "device", "timestamp": 1700000000,
+              "gpu_info": [gpu.parse_nvidia_smi_line(GPU_LINE), gpu.parse_nvidia_smi_line(SECOND_GPU_LINE)]}
+    row = schema.get_metrics_row(report)
+    assert row["gpu_load"] == 0.45 and row["gpu_temperature"] == 61.0
+    # Nothing left once every GPU reads [N/A]
+    report["gpu_info"] = [gpu.parse_nvidia_smi_line(SECOND_GPU_LINE)]
+    row = schema.get_metrics_row(report)
+    assert row["gpu_load"] is None and row["gpu_temperature"] is None
+
+def test_history_drops_reports_it_cannot_store():
+    import main
+    supabase = main.supabase
+    main.supabase = FakeSupabase()
+    try:
+        reports = [
+            {"device_id": "device", "timestamp": 1700000000, "gpu_info": [gpu.parse_nvidia_smi_line(SECOND_GPU_LINE)]},
+            # No timestamp: this one can't become a history row
+            {"device_id": "device", "gpu_info": []}
+        ]
+        assert main.append_metrics_history(reports)
+        assert len(main.supabase.tables["device_metrics"]) == 1
+    finally:
+        main.supabase = supabase
+
+if __name__ == "__main__":
+    print("=== GPU Backend Test (stub nvidia-smi) ===")
+    try:
+        test_parse_nvidia_smi_line()
+        test_unavailable_fields_are_none()
+        test_backend_serves_latest_output()
+        test_restarts_after_process_dies()
+        test_no_gpu_result_is_cached()
+        test_metrics_row_skips_unavailable_readings()
+        test_history_drops_reports_it_cannot_store()
+    except AssertionError as e:
+        print(f"FAILED: {e}")
+        sys.exit(1)
+    print("GPU backend tests passed")
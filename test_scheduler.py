@@ -0,0 +1,243 @@
+import heapq
+import os
+import random
+import sys
+import tempfile
+import uuid
+
+from outbox import BACKOFF_BASE, BACKOFF_MAX, Outbox, BatchRejected
+from scheduler import UploadScheduler, upload_offset, parse_retry_after
+
+# Simulated fleet: FLEET_SIZE daemon agents started in the same couple of
+# seconds (a fleet-wide restart, or cron at the top of the hour), uploading
+# every INTERVAL seconds for INTERVALS intervals, against a stub that accepts
+# STUB_RATE_LIMIT requests per second and answers 429 with Retry-After beyond that
+FLEET_SIZE = 10000
+INTERVAL = 60
+INTERVALS = 10
+START_SKEW = 2.0
+STUB_RATE_LIMIT = 400
+STUB_RETRY_AFTER = 30
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class RateLimitedStub:
+    """Stands in for Supabase: a fixed-window limit per second, latency growing with load"""
+
+    def __init__(self, rate_limit=STUB_RATE_LIMIT, retry_after=STUB_RETRY_AFTER):
+        self.rate_limit = rate_limit
+        self.retry_after = retry_after
+        self.per_second = {}
+        self.rejected = 0
+
+    def handle(self, now):
+        """Return (status, Retry-After header, latency in seconds) for a request arriving at now"""
+        second = int(now)
+        count = self.per_second[second] = self.per_second.get(second, 0) + 1
+        latency = 0.05 + 0.5 * min(count, self.rate_limit) / self.rate_limit
+        if count > self.rate_limit:
+            self.rejected += 1
+            return 429, str(self.retry_after), 0.01
+        return 201, None, latency
+
+    def peak(self):
+        return max(self.per_second.values())
+
+    def busy_seconds(self):
+        return len(self.per_second)
+
+def device_ids(count, seed=0):
+    rng = random.Random(seed)
+    return [str(uuid.UUID(int=rng.getrandbits(128), version=4)) for _ in range(count)]
+
+def simulate_naive(ids, seed=0):
+    """Every agent uploads when its cycle comes round, backing off like the outbox does on its own"""
+    rng = random.Random(seed)
+    stub = RateLimitedStub()
+    end = INTERVAL * INTERVALS
+    events = [(rng.uniform(0, START_SKEW), index) for index in range(len(ids))]
+    heapq.heapify(events)
+    failures = [0] * len(ids)
+    next_attempt_at = [0.0] * len(ids)
+    uploads = 0
+
+    while events:
+        now, index = heapq.heappop(events)
+        if now >= end:
+            continue
+        if now >= next_attempt_at[index]:
+            status, _, latency = stub.handle(now)
+            if status < 400:
+                failures[index] = 0
+                uploads += 1
+            else:
+                failures[index] += 1
+                next_attempt_at[index] = now + rng.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** failures[index]))
+        heapq.heappush(events, (now + INTERVAL, index))
+    return stub, uploads
+
+def simulate_scheduled(ids, seed=0):
+    """Every agent runs the real UploadScheduler on a shared simulated clock"""
+    rng = random.Random(seed)
+    jitter = random.Random(seed + 1)
+    stub = RateLimitedStub()
+    clock = FakeClock()
+    end = INTERVAL * INTERVALS
+    schedulers = [UploadScheduler(device_id, INTERVAL, state_file=None, clock=clock, rng=jitter) for device_id in ids]
+    events = []
+    for index, scheduler in enumerate(schedulers):
+        # Started together, then each sleeps until its own slot like run_daemon() does
+        clock.now = rng.uniform(0, START_SKEW)
+        events.append((clock.now + scheduler.seconds_until_slot(), index))
+    heapq.heapify(events)
+    uploads = 0
+
+    while events:
+        now, index = heapq.heappop(events)
+        if now >= end:
+            continue
+        clock.now = now
+        scheduler = schedulers[index]
+        if scheduler.ready():
+            scheduler.start_cycle()
+            status, retry_after, latency = stub.handle(now)
+            clock.now = now + latency
+            scheduler.observe_response(status, retry_after, latency)
+            if status < 400:
+                scheduler.success()
+                scheduler.finish_cycle()
+                uploads += 1
+            else:
+                scheduler.failure()
+        heapq.heappush(events, (clock.now + max(scheduler.seconds_until_slot(), 0.001), index))
+    return stub, uploads
+
+def test_offsets_are_stable_and_even():
+    ids = device_ids(FLEET_SIZE)
+    assert all(upload_offset(device_id, INTERVAL) == upload_offset(device_id, INTERVAL) for device_id in ids[:100])
+    buckets = [0] * INTERVAL
+    for device_id in ids:
+        offset = upload_offset(device_id, INTERVAL)
+        assert 0 <= offset < INTERVAL
+        buckets[int(offset)] += 1
+    mean = FLEET_SIZE / INTERVAL
+    assert max(buckets) < 1.4 * mean and min(buckets) > 0.6 * mean, buckets
+
+def test_retry_after_is_honoured():
+    clock = FakeClock(1000.0)
+    scheduler = UploadScheduler("device", INTERVAL, state_file=None, clock=clock, rng=random.Random(0))
+    scheduler.observe_response(429, "120")
+    delay = scheduler.failure()
+    assert 120 <= delay <= 150
+    clock.now += 119
+    assert not scheduler.ready()
+    clock.now += delay - 119
+    assert scheduler.ready()
+    # Told to slow down: uploads now skip every other slot
+    assert scheduler.throttle == 2
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:30 GMT", 1445412480.0) == 30.0
+    assert parse_retry_after("soon", 0) is None
+
+def test_throttles_on_latency():
+    clock = FakeClock(1000.0)
+    scheduler = UploadScheduler("device", INTERVAL, state_file=None, latency_target=1.0, clock=clock, rng=random.Random(0))
+    scheduler.start_cycle()
+    for _ in range(5):
+        scheduler.observe_response(201, None, 3.0)
+    scheduler.success()
+    # Throttle changes once per cycle, not per response or batch
+    assert scheduler.throttle == 1
+    scheduler.finish_cycle()
+    assert scheduler.throttle == 2
+    clock.now += INTERVAL
+    assert not scheduler.ready()
+    clock.now += INTERVAL
+    assert scheduler.ready()
+    # Latency back to normal: one step down per upload cycle
+    scheduler.start_cycle()
+    scheduler.observe_response(201, None, 0.1)
+    scheduler.success()
+    scheduler.finish_cycle()
+    assert scheduler.throttle == 1
+
+def test_slow_flush_throttles_once_and_stops():
+    clock = FakeClock(1000.0)
+    scheduler = UploadScheduler("device", INTERVAL, state_file=None, latency_target=1.0, clock=clock, rng=random.Random(0))
+    batches = []
+
+    def upload_batch(reports):
+        batches.append(len(reports))
+        scheduler.observe_response(201, None, 3.0)
+        return reports
+
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = Outbox(os.path.join(directory, "outbox.db"))
+        try:
+            for index in range(30):
+                outbox.put({"index": index})
+            # The first slow batch ends the flush; the rest waits for a later slot
+            assert outbox.flush(upload_batch, batch_size=10, scheduler=scheduler) == 10
+            assert batches == [10] and len(outbox) == 20
+            assert scheduler.throttle == 2
+
+            clock.now += 2 * INTERVAL
+            assert outbox.flush(upload_batch, batch_size=10, scheduler=scheduler) == 10
+            assert scheduler.throttle == 4
+        finally:
+            outbox.close()
+
+def test_rejected_batch_is_quarantined():
+    scheduler = UploadScheduler("device", INTERVAL, state_file=None, clock=FakeClock(1000.0), rng=random.Random(0))
+
+    def upload_batch(reports):
+        if any(report["index"] == 1 for report in reports):
+            raise BatchRejected("400 bad report")
+        return reports
+
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = Outbox(os.path.join(directory, "outbox.db"))
+        try:
+            for index in range(3):
+                outbox.put({"index": index})
+            # The refused batch is set aside and the rest still goes out, without backing off
+            assert outbox.flush(upload_batch, batch_size=1, scheduler=scheduler) == 2
+            assert len(outbox) == 0 and scheduler.failures == 0
+            assert outbox.conn.execute("SELECT COUNT(*) FROM outbox_quarantine").fetchone()[0] == 1
+        finally:
+            outbox.close()
+
+def test_fleet_request_rate_is_flattened(verbose=False):
+    ids = device_ids(FLEET_SIZE)
+    naive, naive_uploads = simulate_naive(ids)
+    scheduled, scheduled_uploads = simulate_scheduled(ids)
+    if verbose:
+        for name, stub, uploads in (("naive", naive, naive_uploads), ("scheduled", scheduled, scheduled_uploads)):
+            print(f"{name:10} peak {stub.peak():5d} req/s over {stub.busy_seconds():4d} busy seconds, "
+                  f"{stub.rejected:6d} rejected with 429, {uploads:6d} uploads")
+
+    expected = FLEET_SIZE * INTERVALS
+    # Spread over the interval the fleet stays under the limit and nothing is rejected
+    assert scheduled.peak() <= STUB_RATE_LIMIT
+    assert scheduled.peak() < naive.peak() / 10
+    assert scheduled.rejected == 0
+    assert scheduled_uploads >= 0.99 * expected
+    assert naive_uploads < scheduled_uploads
+
+if __name__ == "__main__":
+    print(f"=== Upload Scheduler Test ({FLEET_SIZE} agents, {INTERVAL}s interval, stub limit {STUB_RATE_LIMIT} req/s) ===")
+    try:
+        test_offsets_are_stable_and_even()
+        test_retry_after_is_honoured()
+        test_throttles_on_latency()
+        test_slow_flush_throttles_once_and_stops()
+        test_rejected_batch_is_quarantined()
+        test_fleet_request_rate_is_flattened(verbose=True)
+    except AssertionError as e:
+        print(f"FAILED: {e}")
+        sys.exit(1)
+    print("Upload scheduler tests passed")
@@ -0,0 +1,91 @@
+import os
+import subprocess
+import sys
+
+# Cumulative import time allowed for main.py, in milliseconds; override with
+# SPECTRE_IMPORT_BUDGET_MS on slow machines
+IMPORT_BUDGET_MS = float(os.environ.get("SPECTRE_IMPORT_BUDGET_MS", 150))
+
+# Runs of `python -X importtime -c "import main"`; the fastest is compared to the budget
+IMPORT_RUNS = 5
+
+# Modules that must only be imported by the collector or upload that needs them
+DEFERRED_MODULES = ["supabase", "postgrest", "httpx", "cpuinfo", "GPUtil", "tkinter", "PIL", "win32api", "pynvml", "zstandard"]
+
+# Server-side tools that must not load the agent (main.py and its collectors)
+SERVER_TOOLS = ["ingest_gateway", "bulk_import", "bulk_export", "async_upload"]
+
+# Prints the file descriptors and threads an import leaves behind
+SIDE_EFFECTS_PROBE = """
+import os, threading
+fds = set(os.listdir("/proc/self/fd"))
+threads = threading.active_count()
+import main
+print(len(set(os.listdir("/proc/self/fd")) - fds), threading.active_count() - threads)
+"""
+
+def measure_import(module="main"):
+    """Import module in a fresh interpreter and return (cumulative ms, names of every module it imported)"""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True
+    ).stderr
+
+    cumulative_ms = None
+    imported = set()
+    for line in output.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        imported.add(name)
+        if name == module:
+            cumulative_ms = int(fields[1]) / 1000
+    return cumulative_ms, imported
+
+def test_import_time_budget():
+    """Importing main.py stays under IMPORT_BUDGET_MS and defers every heavy dependency"""
+    runs = [measure_import() for _ in range(IMPORT_RUNS)]
+    fastest = min(cumulative_ms for cumulative_ms, _ in runs)
+    print(f"import main: {fastest:.1f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)")
+
+    loaded = [name for name in DEFERRED_MODULES if name in runs[0][1]]
+    assert not loaded, f"import main loads {', '.join(loaded)}; import them where they are used"
+    assert fastest <= IMPORT_BUDGET_MS, f"import main took {fastest:.1f} ms, over the {IMPORT_BUDGET_MS:.0f} ms budget"
+
+def test_import_has_no_side_effects():
+    """Importing main.py opens no files and starts no threads; the collectors do that on first use"""
+    if not os.path.isdir("/proc/self/fd"):
+        return
+    output = subprocess.run(
+        [sys.executable, "-c", SIDE_EFFECTS_PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True
+    ).stdout
+    opened_fds, started_threads = map(int, output.split())
+    assert opened_fds == 0, f"import main left {opened_fds} files open"
+    assert started_threads == 0, f"import main started {started_threads} threads"
+
+def test_server_tools_do_not_load_the_agent():
+    """The gateway and bulk tools share schema.py with the agent instead of importing main"""
+    for tool in SERVER_TOOLS:
+        _, imported = measure_import(tool)
+        loaded = [name for name in ["main", "processes", "cgroups", "disks", "procfs", "sampler"] if name in imported]
+        assert not loaded, f"import {tool} loads {', '.join(loaded)}"
+
+if __name__ == "__main__":
+    print("=== Startup Import Time Test ===")
+    try:
+        test_import_time_budget()
+        test_import_has_no_side_effects()
+        test_server_tools_do_not_load_the_agent()
+    except AssertionError as e:
+        print(f"FAILED: {e}")
+        sys.exit(1)
+    print("Startup import tests passed")